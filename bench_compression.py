@@ -0,0 +1,155 @@
+"""量測 MongoDB 傳輸壓縮對讀取大段文字的影響。
+
+    uv run python bench_compression.py                        # 本機 mongod，2000 篇 20 KB 的文章
+    uv run python bench_compression.py --size 100000 --documents 500
+    uv run python bench_compression.py --mongo-uri mongodb://remote:27017 --compressor zstd
+
+在 --database 指定的資料庫裡放入合成的文章（內容和 benchmark.py 一樣），再用每一種壓縮方式
+各開一個 client 讀取全部文章的內文，比較耗時、吞吐量與伺服器實際送出的位元組數
+（serverStatus 的 network.bytesOut，量測期間不要有其他流量）。
+本機連線頻寬很大，壓縮多半只會增加 CPU 時間；跨機器或跨區連線時傳輸量的差異才會反映在耗時上。
+結束時刪除測試資料庫，--keep 保留。
+"""
+
+import argparse
+from dataclasses import dataclass
+import os
+import random
+import statistics
+import time
+
+from pymongo.database import Database
+
+from benchmark import STYLES, synthetic_article
+from mongo_config import DEFAULT_COMPRESSORS, available_compressors, create_client
+
+COLLECTION = "articles"
+
+
+@dataclass
+class CompressionResult:
+    compressor: str
+    seconds_median: float
+    content_bytes: int
+    wire_bytes: int
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.content_bytes / self.seconds_median / 1e6
+
+    @property
+    def wire_ratio(self) -> float:
+        return self.wire_bytes / self.content_bytes if self.content_bytes else 0.0
+
+
+def seed_articles(db: Database, documents: int, size: int, seed: int) -> int:
+    """Insert synthetic articles; returns the UTF-8 bytes of their content"""
+    rng = random.Random(seed)
+    db[COLLECTION].drop()
+    content_bytes = 0
+    for start in range(0, documents, 500):
+        articles = [
+            synthetic_article(STYLES[i % len(STYLES)], size, rng)
+            for i in range(start, min(start + 500, documents))
+        ]
+        content_bytes += sum(len(article["content"].encode()) for article in articles)
+        db[COLLECTION].insert_many(articles)
+    return content_bytes
+
+
+def _bytes_out(db: Database) -> int:
+    return db.client.admin.command("serverStatus")["network"]["bytesOut"]
+
+
+def _read_contents(db: Database) -> int:
+    return sum(1 for _ in db[COLLECTION].find({}, {"content": 1}, batch_size=1000))
+
+
+def measure(
+    uri: str | None,
+    compressor: str,
+    database: str,
+    content_bytes: int,
+    repeat: int,
+) -> CompressionResult:
+    client = create_client(
+        uri, compressors=[] if compressor == "none" else [compressor]
+    )
+    try:
+        db = client[database]
+        # 第一次讀取建立連線、把資料載入快取，不計時
+        _read_contents(db)
+
+        timings = []
+        bytes_before = _bytes_out(db)
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            _read_contents(db)
+            timings.append(time.perf_counter() - started_at)
+        wire_bytes = (_bytes_out(db) - bytes_before) // repeat
+    finally:
+        client.close()
+
+    return CompressionResult(
+        compressor=compressor,
+        seconds_median=statistics.median(timings),
+        content_bytes=content_bytes,
+        wire_bytes=wire_bytes,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測 MongoDB 傳輸壓縮的效果")
+    parser.add_argument(
+        "--compressor",
+        action="append",
+        choices=["none", *DEFAULT_COMPRESSORS],
+        help="要量測的壓縮方式，可重複指定（預設 none 與所有可用的）",
+    )
+    parser.add_argument("--documents", type=int, default=2000, help="文章數")
+    parser.add_argument("--size", type=int, default=20_000, help="每篇內文的位元組數")
+    parser.add_argument("--repeat", type=int, default=5, help="每種壓縮方式讀取幾次")
+    parser.add_argument("--database", default="bench_compression")
+    parser.add_argument("--keep", action="store_true", help="結束時不刪除測試資料庫")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    compressors = args.compressor or ["none", *available_compressors(DEFAULT_COMPRESSORS)]
+    unavailable = [
+        name
+        for name in compressors
+        if name != "none" and not available_compressors([name])
+    ]
+    for name in unavailable:
+        print(f"略過 {name}：沒有安裝對應的 Python 套件")
+
+    client = create_client(args.mongo_uri)
+    db = client[args.database]
+    started_at = time.perf_counter()
+    content_bytes = seed_articles(db, args.documents, args.size, args.seed)
+    print(
+        f"放入 {args.documents} 篇文章，內文共 {content_bytes / 1e6:.1f} MB，"
+        f"耗時 {time.perf_counter() - started_at:.1f} 秒"
+    )
+
+    try:
+        for compressor in compressors:
+            if compressor in unavailable:
+                continue
+            result = measure(
+                args.mongo_uri, compressor, args.database, content_bytes, args.repeat
+            )
+            print(
+                f"{result.compressor:>6}: {result.seconds_median * 1000:8.1f} ms  "
+                f"{result.megabytes_per_second:8.1f} MB/s  "
+                f"傳輸 {result.wire_bytes / 1e6:8.1f} MB（內文的 {result.wire_ratio:.0%}）"
+            )
+    finally:
+        if not args.keep:
+            client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
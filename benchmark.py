@@ -0,0 +1,458 @@
+"""離線效能測試：用合成的 PTT / Dcard / Yahoo 資料量測清理、斷詞、文字雲與 models 轉換的速度。
+
+    uv run python benchmark.py --output bench/base.json
+    uv run python benchmark.py --output bench/new.json --compare bench/base.json
+
+不需要 MongoDB；斷詞與文字雲需要已下載的 HanLP 模型與 fonts/，缺少時會略過該階段。
+比較時任何一項比基準慢超過 --threshold 就以非 0 結束，方便在 CI 裡擋下退步。
+"""
+
+import argparse
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from bson import ObjectId
+
+import cleaner
+import models
+
+TEXT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+COMMENT_COUNTS = [10, 100, 1_000, 10_000, 100_000]
+
+# 斷詞比清理慢好幾個數量級，預設只量到 100 KB
+SEGMENT_TEXT_SIZES = [1_000, 10_000, 100_000]
+
+STYLES = ["ptt", "dcard", "yahoo"]
+
+# 留言探勘頁面表格實際用到的欄位
+COMMENT_TABLE_COLUMNS = [
+    "_id", "reaction_type", "content", "author", "likes", "dislikes", "created_at"
+]
+
+_SENTENCES = [
+    "今天天氣很好，大家覺得呢？",
+    "政府今天宣布新的政策，引發各界熱烈討論。",
+    "這間餐廳的牛肉麵真的很好吃，推薦給大家。",
+    "股市今天大漲三百點，投資人信心回升。",
+    "有沒有人知道這個問題要怎麼解決？",
+    "我覺得這部電影的劇情有點拖，但是演員表現不錯。",
+    "颱風即將登陸，請民眾做好防颱準備。",
+    "Apple 今天發表新款 iPhone，售價維持不變。",
+]
+_PUSH_TEXTS = ["好文推", "笑死", "這什麼啦", "樓上正解", "已噓", "真的假的", "確實", "推推"]
+_EMOJIS = ["😀", "😂", "👍🏻", "❤️", "🇹🇼", "👨‍👩‍👧"]
+
+
+def synthetic_text(style: str, size: int, rng: random.Random) -> str:
+    """Build a text of at least size UTF-8 bytes in the layout of the given platform"""
+    if style == "ptt":
+        header = (
+            "作者 user (暱稱)\n看板 Gossiping\n標題 [問卦] 有沒有八卦？\n"
+            "時間 Mon Apr 14 12:00:00 2025\n\n"
+        )
+        footer = (
+            "\n--\n※ 發信站: 批踢踢實業坊(ptt.cc), 來自: 1.2.3.4 (臺灣)\n"
+            "※ 文章網址: https://www.ptt.cc/bbs/Gossiping/M.1744600000.A.123.html\n"
+        )
+    elif style == "dcard":
+        header = "大家好，第一次發文請多指教 😀\n---\n"
+        footer = "\n---\n謝謝大家....\nInstagram photos and videos\n"
+    else:
+        header = "記者王小明／台北報導\n"
+        footer = (
+            "\n▲川普上台後，其家族光靠加密幣就進帳高達323億。（圖／翻攝自川普臉書）"
+            "\n更多三立新聞網報導\n延伸閱讀\n"
+        )
+
+    parts = [header]
+    length = len(header.encode()) + len(footer.encode())
+    while length < size:
+        sentence = rng.choice(_SENTENCES)
+        if style == "dcard" and rng.random() < 0.1:
+            sentence += rng.choice(_EMOJIS)
+        if rng.random() < 0.05:
+            sentence += "\n\n"
+        parts.append(sentence)
+        length += len(sentence.encode())
+    parts.append(footer)
+
+    return "".join(parts)
+
+
+def synthetic_article(style: str, size: int, rng: random.Random) -> dict[str, Any]:
+    return {
+        "_id": ObjectId(),
+        "article_id": f"{style}-{rng.randrange(10**9)}",
+        "url": f"https://example.com/{style}/{rng.randrange(10**9)}",
+        "title": rng.choice(_SENTENCES),
+        "created_at": datetime(2025, 4, 14, tzinfo=timezone.utc),
+        "content": synthetic_text(style, size, rng),
+    }
+
+
+def synthetic_comments(style: str, count: int, rng: random.Random) -> list[dict[str, Any]]:
+    article_id = ObjectId()
+    created_at = datetime(2025, 4, 14, tzinfo=timezone.utc)
+
+    comments = []
+    for i in range(count):
+        comment: dict[str, Any] = {
+            "_id": ObjectId(),
+            "article_id": article_id,
+            "comment_id": str(i),
+            "content": rng.choice(_PUSH_TEXTS) if style == "ptt" else rng.choice(_SENTENCES),
+            "created_at": created_at + timedelta(seconds=i),
+            "author": f"user{rng.randrange(1000)}",
+        }
+        # PTT 只有推噓，Dcard / Yahoo 只有讚數，也有缺欄位的文件
+        if style == "ptt":
+            comment["reaction_type"] = rng.choice(["+1", "-1", "0"])
+        elif rng.random() < 0.9:
+            comment["likes"] = rng.randrange(100)
+            comment["dislikes"] = rng.randrange(10) if style == "yahoo" else None
+        comments.append(comment)
+
+    return comments
+
+
+def synthetic_replies(style: str, count: int, rng: random.Random) -> list[dict[str, Any]]:
+    replies = synthetic_comments(style, count, rng)
+    comment_id = ObjectId()
+    for i, reply in enumerate(replies):
+        reply["comment_id"] = comment_id
+        reply["reply_id"] = str(i)
+        reply["content"] = f"B{i % 50 + 1}-{i % 7 + 1} {reply['content']}"
+    return replies
+
+
+@dataclass
+class BenchmarkResult:
+    stage: str
+    case: str
+    items: int
+    bytes: int
+    seconds_min: float
+    seconds_median: float
+    items_per_second: float
+    bytes_per_second: float
+    peak_memory_bytes: int
+
+
+def measure(
+    stage: str,
+    case: str,
+    func: Callable[[], Any],
+    items: int,
+    size_bytes: int,
+    repeat: int,
+) -> BenchmarkResult:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+
+    # tracemalloc 會拖慢執行，記憶體用量另外量一次
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return BenchmarkResult(
+        stage=stage,
+        case=case,
+        items=items,
+        bytes=size_bytes,
+        seconds_min=best,
+        seconds_median=statistics.median(timings),
+        items_per_second=items / best if best else 0.0,
+        bytes_per_second=size_bytes / best if best else 0.0,
+        peak_memory_bytes=peak,
+    )
+
+
+def bench_clean(
+    sizes: list[int], counts: list[int], repeat: int, rng: random.Random
+) -> list[BenchmarkResult]:
+    basic_cleaner = cleaner.BasicCleaner()
+    results = []
+    for style in STYLES:
+        for size in sizes:
+            text = synthetic_text(style, size, rng)
+            results.append(
+                measure(
+                    "clean",
+                    f"{style}/{size}B",
+                    lambda: basic_cleaner.clean_text(text),
+                    items=1,
+                    size_bytes=len(text.encode()),
+                    repeat=repeat,
+                )
+            )
+        for count in counts:
+            texts = [comment["content"] for comment in synthetic_comments(style, count, rng)]
+            results.append(
+                measure(
+                    "clean",
+                    f"{style}/{count} comments",
+                    lambda: [basic_cleaner.clean_text(text) for text in texts],
+                    items=count,
+                    size_bytes=sum(len(text.encode()) for text in texts),
+                    repeat=repeat,
+                )
+            )
+    return results
+
+
+def bench_segment(sizes: list[int], repeat: int, rng: random.Random) -> list[BenchmarkResult]:
+    import nlp
+
+    # 不使用斷詞快取，量的是實際推論的時間
+    nlp_instance = nlp.Nlp(cache=None)
+
+    results = []
+    for style in STYLES:
+        for size in sizes:
+            text = synthetic_text(style, size, rng)
+            results.append(
+                measure(
+                    "segment",
+                    f"{style}/{size}B",
+                    lambda: nlp_instance.segment(text),
+                    items=1,
+                    size_bytes=len(text.encode()),
+                    repeat=repeat,
+                )
+            )
+        for count in [10, 100, 1_000]:
+            texts = [comment["content"] for comment in synthetic_comments(style, count, rng)]
+            results.append(
+                measure(
+                    "segment_many",
+                    f"{style}/{count} comments",
+                    lambda: nlp_instance.segment_many(texts),
+                    items=count,
+                    size_bytes=sum(len(text.encode()) for text in texts),
+                    repeat=repeat,
+                )
+            )
+    return results
+
+
+def bench_word_cloud(repeat: int, rng: random.Random) -> list[BenchmarkResult]:
+    import nlp
+
+    results = []
+    for vocabulary in [50, 500, 5_000]:
+        word_counts = Counter(
+            {f"詞{i}": rng.randrange(1, 1000) for i in range(vocabulary)}
+        )
+        for image_format in ["svg", "png", "webp"]:
+
+            def render(image_format=image_format):
+                # 每次都重新排版，量的不是快取
+                nlp.clear_word_cloud_cache()
+                return nlp.word_cloud(word_counts, image_format)
+
+            results.append(
+                measure(
+                    "word_cloud",
+                    f"{vocabulary} words {image_format}",
+                    render,
+                    items=vocabulary,
+                    size_bytes=0,
+                    repeat=repeat,
+                )
+            )
+    return results
+
+
+def bench_models(counts: list[int], repeat: int, rng: random.Random) -> list[BenchmarkResult]:
+    results = []
+    for style in STYLES:
+        articles = [synthetic_article(style, 1_000, rng) for _ in range(max(counts) // 10)]
+        results.append(
+            measure(
+                "article_from_mongo_model",
+                f"{style}/{len(articles)} articles",
+                lambda: [models.article_from_mongo_model(article) for article in articles],
+                items=len(articles),
+                size_bytes=0,
+                repeat=repeat,
+            )
+        )
+
+        for count in counts:
+            comments = synthetic_comments(style, count, rng)
+            results.append(
+                measure(
+                    "comment_from_mongo_model",
+                    f"{style}/{count} comments",
+                    lambda: [models.comment_from_mongo_model(comment) for comment in comments],
+                    items=count,
+                    size_bytes=0,
+                    repeat=repeat,
+                )
+            )
+
+            results.append(
+                measure(
+                    "comments_frame",
+                    f"{style}/{count} comments",
+                    lambda: models.comments_frame(comments, COMMENT_TABLE_COLUMNS),
+                    items=count,
+                    size_bytes=0,
+                    repeat=repeat,
+                )
+            )
+
+            replies = synthetic_replies(style, count, rng)
+            results.append(
+                measure(
+                    "reply_from_mongo_model",
+                    f"{style}/{count} replies",
+                    lambda: [models.reply_from_mongo_model(reply) for reply in replies],
+                    items=count,
+                    size_bytes=0,
+                    repeat=repeat,
+                )
+            )
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    results: list[BenchmarkResult], baseline_path: str, threshold: float
+) -> list[str]:
+    """Return a line per (stage, case) that got slower than the baseline by more than threshold"""
+    with open(baseline_path, "r") as f:
+        baseline = {
+            (result["stage"], result["case"]): result for result in json.load(f)["results"]
+        }
+
+    regressions = []
+    for result in results:
+        base = baseline.get((result.stage, result.case))
+        if base is None or base["seconds_min"] == 0:
+            continue
+
+        change = result.seconds_min / base["seconds_min"] - 1
+        line = (
+            f"{result.stage:<26} {result.case:<24} "
+            f"{base['seconds_min'] * 1000:>10.2f} ms -> {result.seconds_min * 1000:>10.2f} ms "
+            f"({change:+.1%})"
+        )
+        print(line)
+        if change > threshold:
+            regressions.append(line)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測清理、斷詞、文字雲與 models 轉換的效能")
+    parser.add_argument(
+        "--stage",
+        action="append",
+        choices=["clean", "segment", "word_cloud", "models"],
+        help="要量測的階段，可重複指定（預設全部）",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每項重複次數，取最快的一次")
+    parser.add_argument("--quick", action="store_true", help="只跑較小的資料量")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="將結果寫成 JSON")
+    parser.add_argument("--compare", help="與先前輸出的 JSON 比較")
+    parser.add_argument(
+        "--threshold", type=float, default=0.15, help="慢多少比例視為退步（預設 0.15）"
+    )
+    args = parser.parse_args()
+
+    stages = args.stage or ["clean", "segment", "word_cloud", "models"]
+    text_sizes = TEXT_SIZES[:2] if args.quick else TEXT_SIZES
+    segment_sizes = SEGMENT_TEXT_SIZES[:1] if args.quick else SEGMENT_TEXT_SIZES
+    comment_counts = COMMENT_COUNTS[:3] if args.quick else COMMENT_COUNTS
+    rng = random.Random(args.seed)
+
+    results: list[BenchmarkResult] = []
+    skipped: dict[str, str] = {}
+    for stage in stages:
+        try:
+            if stage == "clean":
+                results += bench_clean(text_sizes, comment_counts, args.repeat, rng)
+            elif stage == "segment":
+                results += bench_segment(segment_sizes, args.repeat, rng)
+            elif stage == "word_cloud":
+                results += bench_word_cloud(args.repeat, rng)
+            elif stage == "models":
+                results += bench_models(comment_counts, args.repeat, rng)
+        except (ImportError, OSError) as e:
+            # 沒有模型、字型或選用套件時略過，不影響其他階段
+            skipped[stage] = str(e)
+            print(f"略過 {stage}: {e}", file=sys.stderr)
+
+    for result in results:
+        print(
+            f"{result.stage:<26} {result.case:<24} "
+            f"{result.seconds_min * 1000:>10.2f} ms "
+            f"{result.items_per_second:>12.0f} items/s "
+            f"{result.bytes_per_second / 1_000_000:>8.2f} MB/s "
+            f"peak {result.peak_memory_bytes / 1_000_000:>8.2f} MB"
+        )
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "git_revision": git_revision(),
+                        "python": sys.version,
+                        "platform": platform.platform(),
+                        "seed": args.seed,
+                        "repeat": args.repeat,
+                        "skipped": skipped,
+                    },
+                    "results": [asdict(result) for result in results],
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 項比基準慢超過 {args.threshold:.0%}：", file=sys.stderr)
+            for line in regressions:
+                print(line, file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
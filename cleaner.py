@@ -1,80 +1,183 @@
 import re
 import unicodedata
 import emoji
+from emoji.unicode_codes import EMOJI_DATA
+
+# 所有規則在 import 時編譯一次，每個 BasicCleaner 共用。
+# 每個步驟先用 `in` 檢查它一定需要的字元，文字裡沒有就整段跳過，不必跑 regex。
+
+SEPARATOR_PATTERN = re.compile(r"^\s*(?:-{3,}|⸻+)\s*$", re.MULTILINE)
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+
+# Pattern for figure captions like "▲川普上台後，其家族光靠加密幣就進帳高達323億。（圖／翻攝自川普臉書）"
+FIGURE_CAPTION_PATTERN = re.compile(r"▲[^。]*。（[^）]*）")
+
+# Pattern for related news sections
+RELATED_NEWS_PATTERNS = [
+    re.compile(r"更多.*報導.*", re.DOTALL),
+    re.compile(r"看更多相關新聞.*", re.DOTALL),
+    re.compile(r"相關報導.*", re.DOTALL),
+    re.compile(r"延伸閱讀.*", re.DOTALL),
+]
+# 後三個規則都是「從某個字串開始刪到結尾」，彼此不會重疊，只要找最早出現的位置
+RELATED_NEWS_MARKERS = ["看更多相關新聞", "相關報導", "延伸閱讀"]
+
+# Pattern for PTT metadata
+PTT_METADATA_PATTERN = re.compile(
+    r"--\s*\n"
+    r"※\s+發信站:.*?\n"
+    r"(?:※\s+文章網址:.*?\n)?"
+    r"(?:※\s+編輯:.*?\n)*",
+    re.DOTALL,
+)
+
+# Pattern for reply floor references like "B1" or "B1-2"
+FLOOR_PATTERN = re.compile(r"B\d+(?:-\d+)?")
+
+# 開頭的來源行最多只會有一種，和 "By-..." 合併成一次掃描
+SOURCE_PREFIXES = ("來源：", "文章撰文者｜", "文章出處：")
+SOURCE_PATTERN = re.compile(r"^(?:來源：|文章撰文者｜|文章出處：).*|By[—\-:]+.*")
+
+INSTAGRAM_CAPTION_PATTERN = re.compile(r"Instagram \(.*?\)")
+REPORTER_PATTERN = re.compile(r"記者(.+)\s*[／/].*報導")
+
+# 換行與連續空白都會變成一個空白；四個以上的點變成刪節號
+WHITESPACE_AND_ELLIPSIS_PATTERN = re.compile(r"(?P<space>[ \r\n]{2,}|[\r\n])|\.{4,}")
+
+
+def _codepoint_ranges_pattern(chars: set[str]) -> re.Pattern[str]:
+    codepoints = sorted(ord(char) for char in chars)
+
+    ranges: list[tuple[int, int]] = []
+    for codepoint in codepoints:
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1] = (ranges[-1][0], codepoint)
+        else:
+            ranges.append((codepoint, codepoint))
+
+    return re.compile(
+        "["
+        + "".join(
+            re.escape(chr(start))
+            if start == end
+            else f"{re.escape(chr(start))}-{re.escape(chr(end))}"
+            for start, end in ranges
+        )
+        + "]"
+    )
+
+
+def _emoji_patterns() -> tuple[re.Pattern[str], re.Pattern[str]] | None:
+    """Codepoints that are emojis by themselves, and those only used in sequences"""
+    standalone = {key for key in EMOJI_DATA if len(key) == 1}
+    # emoji.replace_emoji 也會刪掉單獨出現的 variation selector
+    standalone.update({"\ufe0e", "\ufe0f"})
+
+    # ZWJ、keycap（U+20E3）、國旗的 regional indicator 與旗幟的 tag 字元
+    sequence_only: set[str] = set()
+    for emoji_sequence in EMOJI_DATA:
+        parts = {char for char in emoji_sequence if char not in standalone}
+        if parts and all(char.isascii() for char in parts):
+            # 只靠 ASCII 組成的序列無法用字元範圍判斷，只能每次都交給 emoji 套件
+            return None
+        sequence_only.update(char for char in parts if not char.isascii())
+
+    return (
+        _codepoint_ranges_pattern(standalone),
+        _codepoint_ranges_pattern(sequence_only),
+    )
+
+
+# 文字裡沒有 sequence_only 的字元時，每個 emoji 都只由 standalone 的字元組成，
+# 逐字刪掉和 emoji.replace_emoji 的結果相同
+EMOJI_PATTERNS = _emoji_patterns()
 
 
 class BasicCleaner:
     def __init__(self):
         # Patterns for cleaning
-        self.separator_pattern = re.compile(r"^\s*(?:-{3,}|⸻+)\s*$", re.MULTILINE)
-        self.html_tag_pattern = re.compile(r"<[^>]+>")
-        self.url_pattern = re.compile(r"https?://\S+|www\.\S+")
-
-        # Pattern for figure captions like "▲川普上台後，其家族光靠加密幣就進帳高達323億。（圖／翻攝自川普臉書）"
-        self.figure_caption_pattern = re.compile(r"▲[^。]*。（[^）]*）")
-
-        # Pattern for related news sections
-        self.related_news_patterns = [
-            re.compile(r"更多.*報導.*", re.DOTALL),
-            re.compile(r"看更多相關新聞.*", re.DOTALL),
-            re.compile(r"相關報導.*", re.DOTALL),
-            re.compile(r"延伸閱讀.*", re.DOTALL),
-        ]
-
-        # Pattern for PTT metadata
-        self.ptt_metadata_pattern = re.compile(
-            r"--\s*\n"
-            r"※\s+發信站:.*?\n"
-            r"(?:※\s+文章網址:.*?\n)?"
-            r"(?:※\s+編輯:.*?\n)*",
-            re.DOTALL,
-        )
+        self.separator_pattern = SEPARATOR_PATTERN
+        self.html_tag_pattern = HTML_TAG_PATTERN
+        self.url_pattern = URL_PATTERN
+        self.figure_caption_pattern = FIGURE_CAPTION_PATTERN
+        self.related_news_patterns = RELATED_NEWS_PATTERNS
+        self.ptt_metadata_pattern = PTT_METADATA_PATTERN
+        self.floor_pattern = FLOOR_PATTERN
 
     def remove_emojis(self, text: str) -> str:
         """Remove emojis from text"""
-        return emoji.replace_emoji(text, "")
+        if EMOJI_PATTERNS is None:
+            return emoji.replace_emoji(text, "")
+        standalone_pattern, sequence_only_pattern = EMOJI_PATTERNS
+        if sequence_only_pattern.search(text):
+            # ZWJ、keycap 與國旗序列要照 emoji 套件的規則整段比對
+            return emoji.replace_emoji(text, "")
+        return standalone_pattern.sub("", text)
 
     def remove_separators(self, text: str) -> str:
         """Remove unnecessary separators like '---' from text"""
+        if "---" not in text and "⸻" not in text:
+            return text
         return self.separator_pattern.sub(r"", text)
 
     def remove_html_and_urls(self, text: str) -> str:
         """Remove HTML tags and URLs from text"""
-        text = self.html_tag_pattern.sub(r"", text)
+        if "<" in text:
+            text = self.html_tag_pattern.sub(r"", text)
+        if "://" not in text and "www." not in text:
+            return text
         return self.url_pattern.sub(r"", text)
 
     def remove_figure_captions(self, text: str) -> str:
         """Remove figure captions"""
+        if "▲" not in text:
+            return text
         return self.figure_caption_pattern.sub(r"", text)
 
     def remove_related_news(self, text: str) -> str:
         """Remove sections that begin with phrases like '更多...報導', '看更多相關新聞', etc."""
-        for pattern in self.related_news_patterns:
-            text = pattern.sub(r"", text)
+        # 更多.*報導.* — 只有第一個「更多」之後還有「報導」時才會刪除
+        more_at = text.find("更多")
+        if more_at != -1 and text.rfind("報導") >= more_at + len("更多"):
+            text = text[:more_at]
+
+        cut_at = min(
+            (at for marker in RELATED_NEWS_MARKERS if (at := text.find(marker)) != -1),
+            default=-1,
+        )
+        if cut_at != -1:
+            text = text[:cut_at]
         return text
 
     def remove_ptt_metadata(self, text: str) -> str:
         """Remove PTT metadata"""
+        if "※" not in text:
+            return text
         return self.ptt_metadata_pattern.sub(r"", text)
 
+    def remove_floor_numbers(self, text: str) -> str:
+        """Remove reply floor references like 'B1' or 'B1-2'"""
+        return self.floor_pattern.sub(r"", text)
+
     def remove_sources(self, text: str) -> str:
         """Remove sources"""
-        text = re.sub(r"^來源：.*", "", text)
-        text = re.sub(r"^文章撰文者｜.*", "", text)
-        text = re.sub(r"^文章出處：.*", "", text)
-        text = re.sub(r"By[—\-:]+.*", "", text)
-        return text
+        if "By" not in text and not text.startswith(SOURCE_PREFIXES):
+            return text
+        return SOURCE_PATTERN.sub("", text)
 
     def remove_other_links(self, text: str) -> str:
         """Remove other links"""
 
-        text = text.replace("Instagram photos and videos", "")
-        text = re.sub(r"Instagram \(.*?\)", "", text)
+        if "Instagram" in text:
+            text = text.replace("Instagram photos and videos", "")
+            text = INSTAGRAM_CAPTION_PATTERN.sub("", text)
         text = text.replace("(?:更多資訊|最新時事觀點)歡迎.+", "")
         text = text.replace(
             "如果你喜歡這種.*的深度分析，也歡迎留言告訴我你還想知道什麼。", ""
         )
-        text = re.sub(r"記者(.+)\s*[／/].*報導", "", text)
+        if "記者" in text:
+            text = REPORTER_PATTERN.sub("", text)
 
         return text
 
@@ -96,9 +199,9 @@ class BasicCleaner:
         text = self.remove_other_links(text)
 
         # Remove extra whitespace and normalize line breaks
-        text = re.sub(r"[\r\n]+", " ", text)
-        text = re.sub(r" {2,}", " ", text)
-        text = re.sub(r"\.\.\.\.+", "…", text)
+        text = WHITESPACE_AND_ELLIPSIS_PATTERN.sub(
+            lambda match: " " if match.lastgroup == "space" else "…", text
+        )
         text = text.strip()
 
         return text
@@ -1,17 +1,322 @@
+from collections import Counter
+from collections.abc import Callable
+from datetime import date, datetime, time
 import streamlit as st
+from bson import ObjectId
 from pymongo import MongoClient
-import os
+from pymongo.database import Database
+
+import dedupe
+import keyword_index
+import mongo_config
+import monitoring
+import nlp
+from pagination import CursorState, Page, PageToken, SortDirection
+import profiling
+from query_cache import QueryCache, QueryRepository
+from terms import load_term_counts
 
 
 @st.cache_resource
 def get_database_client() -> MongoClient:
     try:
-        client = MongoClient(os.getenv("MONGO_URI"))
+        client = mongo_config.create_client(
+            read_preference=mongo_config.BROWSING_READ_PREFERENCE,
+            event_listeners=monitoring.event_listeners(),
+        )
         return client
     except Exception as e:
         st.error(f"連線到 MongoDB 時發生錯誤: {e}")
         st.stop()
 
 
-def platform_options() -> list[str]:
-    return ["dcard", "ptt", "yahoo"]
+@st.cache_resource
+def get_repository() -> QueryRepository:
+    """所有頁面共用的查詢快取；同一個查詢在 TTL 內不會再送到 MongoDB"""
+    return QueryRepository(get_database_client(), QueryCache())
+
+
+def query_cache_panel(repository: QueryRepository) -> None:
+    """在側邊欄顯示查詢快取的命中率，並提供清除快取的按鈕"""
+    with st.sidebar.expander("查詢快取"):
+        stats = repository.stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("命中率", f"{stats.hit_rate:.0%}")
+            st.metric("筆數", stats.entries)
+        with col2:
+            st.metric("命中 / 未命中", f"{stats.hits} / {stats.misses}")
+            st.metric("大小", f"{stats.size_bytes / 1024 / 1024:.1f} MB")
+        st.caption(
+            f"TTL {repository.cache.ttl_seconds:g} 秒，"
+            f"過期 {stats.expirations} 筆、淘汰 {stats.evictions} 筆"
+        )
+        if st.button("清除快取", key="query_cache_clear"):
+            repository.invalidate()
+            st.rerun()
+
+
+def profiling_panel() -> None:
+    """在側邊欄顯示每一頁第一次與最近一次的渲染時間（APP_PROFILE=1 時）"""
+    with st.sidebar.expander("效能分析"):
+        for profile in profiling.render_profiles():
+            st.markdown(f"**{profile.page}**（{profile.runs} 次）")
+            st.caption(
+                f"第一次 {profile.first_seconds or 0:.2f} 秒，"
+                f"最近一次 {profile.last_seconds or 0:.2f} 秒"
+            )
+            slowest = sorted(
+                profile.first_imports, key=lambda record: record.seconds, reverse=True
+            )[:5]
+            if slowest:
+                st.caption(
+                    "第一次渲染載入的模組："
+                    + "、".join(
+                        f"{record.module} {record.seconds:.2f} 秒" for record in slowest
+                    )
+                )
+
+
+def monitoring_panel(page: str) -> None:
+    """在側邊欄顯示這一頁最近一次重跑的耗時與最慢的查詢（APP_MONITOR=1 時）"""
+    with st.sidebar.expander("MongoDB 監控"):
+        rerun = monitoring.last_rerun(page)
+        if rerun is not None:
+            st.caption(
+                f"最近一次重跑 {rerun.seconds:.2f} 秒，"
+                f"其中 MongoDB {rerun.commands} 個指令 {rerun.command_seconds:.2f} 秒"
+            )
+            if rerun.stages:
+                st.caption(
+                    "、".join(
+                        f"{name} {seconds:.2f} 秒"
+                        for name, seconds in rerun.stages.items()
+                    )
+                )
+
+        slowest = monitoring.slowest_commands(page)
+        if slowest:
+            st.dataframe(
+                [
+                    {
+                        "指令": command.command,
+                        "collection": command.collection,
+                        "毫秒": round(command.seconds * 1000, 1),
+                        "文件數": command.documents,
+                        "KB": round(command.reply_bytes / 1024, 1),
+                        "內容": command.summary,
+                    }
+                    for command in slowest
+                ],
+                hide_index=True,
+            )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "JSON",
+                monitoring.to_json(),
+                file_name="monitoring.json",
+                mime="application/json",
+                key="monitoring_json",
+            )
+        with col2:
+            st.download_button(
+                "Prometheus",
+                monitoring.to_prometheus(),
+                file_name="monitoring.prom",
+                mime="text/plain",
+                key="monitoring_prometheus",
+            )
+
+
+# 文件頻率表在記憶體裡保留的秒數，之後重新讀取 keyword_index.py 更新過的表
+IDF_TABLE_TTL_SECONDS = 600
+
+
+@st.cache_resource(ttl=IDF_TABLE_TTL_SECONDS, show_spinner=False)
+def get_idf_table(platform: str, source: str) -> keyword_index.IdfTable | None:
+    return keyword_index.load_idf_table(get_database_client()[platform], source)
+
+
+def top_keywords(
+    platform: str, source: str, word_counts: dict[str, int], k: int = 5
+) -> list[str]:
+    """有文件頻率表時用 TF-IDF 挑關鍵字，沒有的話取最常出現的詞"""
+    with monitoring.stage("關鍵字"):
+        # 回覆和留言用同一張表
+        table = get_idf_table(
+            platform, "articles" if source == "articles" else "comments"
+        )
+        if table is None:
+            return nlp.keywords(word_counts, k)
+        return keyword_index.tfidf_keywords(word_counts, table, k)
+
+
+# 討論串的重複留言在記憶體裡保留的秒數；留言數改變時也會重新計算
+DUPLICATES_TTL_SECONDS = 600
+
+
+@st.cache_data(ttl=DUPLICATES_TTL_SECONDS, max_entries=32, show_spinner=False)
+def thread_duplicates(
+    platform: str, article_id: str, total: int
+) -> list[dedupe.DuplicateSummary]:
+    """一篇文章所有留言中重複或幾乎相同的組，則數多的在前"""
+    comments = get_database_client()[platform]["comments"].find(
+        {"article_id": ObjectId(article_id)}, {"content": 1, "_id": 0}
+    )
+    return dedupe.duplicate_summaries(
+        [comment.get("content") or "" for comment in comments]
+    )
+
+
+def get_nlp_or_notice(key: str) -> nlp.Nlp | None:
+    """取得共用的 Nlp；模型還沒載入完成時顯示提示並回傳 None，不阻塞頁面"""
+    if nlp.is_ready():
+        load_seconds = nlp.load_seconds()
+        if load_seconds is not None:
+            st.caption(f"斷詞模型載入耗時 {load_seconds:.1f} 秒")
+
+        nlp_instance = nlp.get_shared_nlp()
+        if nlp_instance.cache is not None:
+            cache_stats = nlp_instance.cache.stats()
+            st.caption(
+                f"斷詞快取：{cache_stats.entries} 筆，命中 {cache_stats.hits} 次、"
+                f"未命中 {cache_stats.misses} 次（命中率 {cache_stats.hit_rate:.0%}）"
+            )
+        return nlp_instance
+
+    if not nlp.is_loading() and (error := nlp.load_error()) is not None:
+        st.error(f"載入斷詞模型時發生錯誤: {error}")
+        if st.button("重新載入模型", key=f"{key}_reload_nlp"):
+            nlp.warm_up()
+            st.rerun()
+        return None
+
+    nlp.warm_up()
+    st.info("斷詞模型載入中，請稍候…")
+    if st.button("重新檢查", key=f"{key}_check_nlp"):
+        st.rerun()
+    return None
+
+
+def word_counts_or_notice(
+    db: Database,
+    source: str,
+    ids: list[ObjectId],
+    texts: list[str],
+    key: str,
+    preprocess: Callable[[nlp.Nlp, str], str] | None = None,
+) -> Counter[str] | None:
+    """合併文件的詞頻：優先使用離線算好的結果，其餘才即時斷詞；模型還沒準備好時回傳 None"""
+    precomputed = load_term_counts(db, source, ids)
+
+    word_counts: Counter[str] = Counter()
+    for counts in precomputed.values():
+        word_counts.update(counts)
+
+    missing_texts = [
+        text for _id, text in zip(ids, texts, strict=True) if _id not in precomputed
+    ]
+    if missing_texts:
+        nlp_instance = get_nlp_or_notice(key)
+        if nlp_instance is None:
+            return None
+
+        with monitoring.stage("斷詞"):
+            if preprocess is not None:
+                missing_texts = [
+                    preprocess(nlp_instance, text) for text in missing_texts
+                ]
+            # 重複的留言只斷詞一次，詞頻乘上則數
+            word_counts.update(
+                dedupe.weighted_word_counts(nlp_instance, missing_texts)
+            )
+
+    return word_counts
+
+
+def _go_to_next_page(state: CursorState, token: PageToken | None) -> None:
+    state.after, state.before = token, None
+    if state.page_number is not None:
+        state.page_number += 1
+
+
+def _go_to_previous_page(state: CursorState, token: PageToken | None) -> None:
+    state.after, state.before = None, token
+    if state.page_number is not None:
+        state.page_number -= 1
+
+
+def _go_to_first_page(state: CursorState) -> None:
+    state.after, state.before, state.page_number = None, None, 1
+
+
+def _go_to_date(state: CursorState, key: str, direction: SortDirection) -> None:
+    selected: date = st.session_state[f"{key}_jump_date"]
+    if direction == 1:
+        # 由舊到新：從當天 00:00 開始
+        boundary = datetime.combine(selected, time.min)
+    else:
+        # 由新到舊：從當天最後一刻往前
+        boundary = datetime.combine(selected, time.max)
+    state.after, state.before, state.page_number = PageToken(boundary), None, None
+
+
+def pagination_controls(
+    state: CursorState, page: Page, key: str, direction: SortDirection
+) -> None:
+    """在側邊欄顯示上一頁 / 下一頁與跳至日期"""
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        st.button(
+            "上一頁",
+            key=f"{key}_previous",
+            disabled=not page.has_previous,
+            on_click=_go_to_previous_page,
+            args=(state, page.first_token),
+            use_container_width=True,
+        )
+    with col2:
+        st.button(
+            "下一頁",
+            key=f"{key}_next",
+            disabled=not page.has_next,
+            on_click=_go_to_next_page,
+            args=(state, page.last_token),
+            use_container_width=True,
+        )
+
+    st.sidebar.date_input("跳至日期", value=None, key=f"{key}_jump_date")
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        st.button(
+            "跳至日期",
+            key=f"{key}_jump",
+            disabled=st.session_state.get(f"{key}_jump_date") is None,
+            on_click=_go_to_date,
+            args=(state, key, direction),
+            use_container_width=True,
+        )
+    with col2:
+        st.button(
+            "回到第一頁",
+            key=f"{key}_first",
+            disabled=not page.has_previous,
+            on_click=_go_to_first_page,
+            args=(state,),
+            use_container_width=True,
+        )
+
+
+def page_caption(state: CursorState, page: Page, total: int) -> str:
+    if not page.documents:
+        return f"這一頁沒有資料，共 {total} 筆"
+
+    first_date = page.documents[0]["created_at"].strftime("%Y-%m-%d %H:%M")
+    last_date = page.documents[-1]["created_at"].strftime("%Y-%m-%d %H:%M")
+    position = f"第 {state.page_number} 頁，" if state.page_number is not None else ""
+    return (
+        f"{position}顯示 {first_date} ~ {last_date} 的 {len(page.documents)} 筆，"
+        f"共 {total} 筆"
+    )
@@ -0,0 +1,231 @@
+"""在斷詞之前合併重複與幾乎相同的留言。
+
+PTT 與 Dcard 的討論串裡有大量重複的推文與複製貼上的洗版，每則都送進清理、斷詞與詞性標註
+很浪費，也會讓關鍵字偏向洗版的內容。這裡先把文字正規化（NFKC、小寫、去掉空白與標點），
+完全相同的合成一組；夠長的文字再用 MinHash（字元 bigram，64 個排列，用 NumPy 一次算完）
+與 LSH 找出相似度在 MIN_SIMILARITY 以上的，併入同一組。每組只斷詞一次，詞頻乘上組內的則數。
+"""
+
+from collections import Counter
+from collections.abc import Sequence
+from dataclasses import dataclass
+import re
+import unicodedata
+
+import numpy as np
+
+import nlp
+
+# 連續的字母、數字與中日韓文字（與 search_index 相同）
+RUN_PATTERN = re.compile(r"[^\W_]+")
+
+# 字元 bigram，與 search_index 的索引詞相同
+SHINGLE_SIZE = 2
+
+# MinHash 估計的 Jaccard 相似度達到這個值就當作同一則
+MIN_SIMILARITY = 0.7
+
+# 太短的文字 bigram 太少，相似度不可靠，只合併完全相同的
+MIN_MINHASH_LENGTH = 8
+
+NUM_PERMUTATIONS = 64
+
+# LSH：64 個 MinHash 分成 16 段、每段 4 個，至少一段完全相同的才是候選；
+# 相似度 0.7 的一對被找到的機率約 98%
+_BANDS = 16
+_ROWS = NUM_PERMUTATIONS // _BANDS
+
+# 一次計算 MinHash 的文字數，控制中間陣列（bigram 數 × 64）的大小
+MINHASH_CHUNK_SIZE = 1000
+
+# 同一段值相同的候選分塊比較，每塊的列數
+_COMPARE_BLOCK = 256
+
+_random = np.random.default_rng(20250414)
+_MULTIPLIERS = _random.integers(1, 2**63, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_INCREMENTS = _random.integers(0, 2**63, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+@dataclass
+class DuplicateGroup:
+    """Indices of texts that are the same comment; the first one represents the group"""
+
+    members: list[int]
+
+    @property
+    def representative(self) -> int:
+        return self.members[0]
+
+    @property
+    def weight(self) -> int:
+        return len(self.members)
+
+
+def dedupe_key(text: str) -> str:
+    """Text with case, width, spacing and punctuation differences removed"""
+    return "".join(RUN_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold()))
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    # splitmix64：讓相近的輸入也得到差很多的雜湊值
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def minhashes(texts: Sequence[str]) -> np.ndarray:
+    """NUM_PERMUTATIONS MinHash values of the character bigrams of each (non-empty) text"""
+    signatures = np.zeros((len(texts), NUM_PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(texts), MINHASH_CHUNK_SIZE):
+        chunk = texts[start : start + MINHASH_CHUNK_SIZE]
+        signatures[start : start + len(chunk)] = _minhash_chunk(chunk)
+    return signatures
+
+
+def _minhash_chunk(texts: Sequence[str]) -> np.ndarray:
+    # 所有文字接成一個碼位陣列，每段後面補 SHINGLE_SIZE - 1 個 0，
+    # bigram 不會跨到下一段，只有一個字的文字也有一個 bigram
+    padding = "\0" * (SHINGLE_SIZE - 1)
+    codepoints = np.frombuffer(
+        (padding.join(texts) + padding).encode("utf-32-le"), dtype=np.uint32
+    ).astype(np.uint64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    offsets = np.cumsum(lengths) - lengths
+    starts = offsets + np.arange(len(texts)) * (SHINGLE_SIZE - 1)
+
+    # 每個 bigram 的起點：每段文字內的每個位置
+    positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    shingles = np.zeros(len(positions), dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        shingles = (shingles << np.uint64(21)) | codepoints[positions + offset]
+
+    # 每個排列是一組 a * h + b（mod 2^64）再打散；每段文字取各排列的最小值
+    permuted = _mix(_mix(shingles)[:, None] * _MULTIPLIERS + _INCREMENTS)
+    return np.minimum.reduceat(permuted, offsets, axis=0)
+
+
+def _find(parents: list[int], i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def near_duplicate_pairs(
+    signatures: np.ndarray, min_similarity: float = MIN_SIMILARITY
+) -> list[tuple[int, int]]:
+    """Pairs of MinHash signatures whose estimated Jaccard similarity is high enough"""
+    pairs: set[tuple[int, int]] = set()
+    for band in range(_BANDS):
+        rows = signatures[:, band * _ROWS : (band + 1) * _ROWS]
+        keys = rows[:, 0]
+        for row in range(1, _ROWS):
+            keys = _mix(keys ^ rows[:, row])
+
+        order = np.argsort(keys, kind="stable")
+        # 同一段值相同的連續區間，只看有兩個以上的
+        run_starts = np.flatnonzero(np.diff(keys[order], prepend=~keys[order[:1]]))
+        run_ends = np.append(run_starts[1:], len(order))
+        shared = np.flatnonzero(run_ends - run_starts >= 2)
+        for run_start, run_end in zip(run_starts[shared], run_ends[shared]):
+            run = order[run_start:run_end]
+            run_signatures = signatures[run]
+            # 兩邊都分塊比較，記憶體不隨區間長度成長；只需要 left < right 的那一半
+            for start in range(0, len(run), _COMPARE_BLOCK):
+                block = run_signatures[start : start + _COMPARE_BLOCK]
+                for other in range(start, len(run), _COMPARE_BLOCK):
+                    other_block = run_signatures[other : other + _COMPARE_BLOCK]
+                    equal = block[:, None, :] == other_block[None, :, :]
+                    similarity = equal.mean(axis=2)
+                    left, right = np.nonzero(similarity >= min_similarity)
+                    left += start
+                    right += other
+                    keep = left < right
+                    pairs.update(
+                        zip(run[left[keep]].tolist(), run[right[keep]].tolist())
+                    )
+    return sorted(pairs)
+
+
+def group_texts(
+    texts: Sequence[str],
+    min_similarity: float = MIN_SIMILARITY,
+    min_minhash_length: int = MIN_MINHASH_LENGTH,
+) -> list[DuplicateGroup]:
+    """Group identical and near-identical texts, in order of first appearance"""
+    # 完全相同（正規化後）的先合成一組；沒有文字的留言各自一組
+    groups: list[list[int]] = []
+    keys: list[str] = []
+    group_of_key: dict[str, int] = {}
+    for i, text in enumerate(texts):
+        key = dedupe_key(text)
+        if key in group_of_key:
+            groups[group_of_key[key]].append(i)
+            continue
+        if key:
+            group_of_key[key] = len(groups)
+        groups.append([i])
+        keys.append(key)
+
+    # 夠長的再用 MinHash 合併幾乎相同的組；每組的根是最早出現的那一組
+    parents = list(range(len(groups)))
+    candidates = [j for j, key in enumerate(keys) if len(key) >= min_minhash_length]
+    if len(candidates) >= 2:
+        signatures = minhashes([keys[j] for j in candidates])
+        for a, b in near_duplicate_pairs(signatures, min_similarity):
+            root_a = _find(parents, candidates[a])
+            root_b = _find(parents, candidates[b])
+            if root_a != root_b:
+                parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    merged: dict[int, list[int]] = {}
+    for j, members in enumerate(groups):
+        merged.setdefault(_find(parents, j), []).extend(members)
+    return [DuplicateGroup(sorted(members)) for members in merged.values()]
+
+
+def weighted_word_counts(nlp_instance: nlp.Nlp, texts: Sequence[str]) -> Counter[str]:
+    """Word counts of all texts, segmenting one text per duplicate group"""
+    groups = group_texts(texts)
+    documents = nlp_instance.word_count_many(
+        [texts[group.representative] for group in groups]
+    ).documents
+
+    total: Counter[str] = Counter()
+    for group, counts in zip(groups, documents, strict=True):
+        if group.weight == 1:
+            total.update(counts)
+        else:
+            total.update({word: count * group.weight for word, count in counts.items()})
+    return total
+
+
+@dataclass
+class DuplicateSummary:
+    text: str
+    count: int
+    # 組內其他不同的寫法（最多 MAX_VARIANTS 個）
+    variants: list[str]
+
+
+MAX_VARIANTS = 5
+
+
+def duplicate_summaries(texts: Sequence[str]) -> list[DuplicateSummary]:
+    """Groups with more than one text, largest first"""
+    summaries = []
+    for group in group_texts(texts):
+        if group.weight < 2:
+            continue
+        representative = texts[group.representative]
+        variants: list[str] = []
+        for i in group.members[1:]:
+            if texts[i] != representative and texts[i] not in variants:
+                variants.append(texts[i])
+                if len(variants) == MAX_VARIANTS:
+                    break
+        summaries.append(DuplicateSummary(representative, group.weight, variants))
+
+    summaries.sort(key=lambda summary: summary.count, reverse=True)
+    return summaries
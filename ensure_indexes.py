@@ -0,0 +1,316 @@
+"""建立頁面查詢需要的索引，並用 explain() 確認每個查詢都有用到索引。
+
+    uv run python ensure_indexes.py                  # 所有平台：建立索引後檢查查詢計畫
+    uv run python ensure_indexes.py --no-create      # 只檢查（例如部署前在 CI 裡跑）
+    uv run python ensure_indexes.py --platform ptt --verbose
+
+查詢計畫裡只要有 COLLSCAN（掃描整個 collection）或 SORT（在記憶體裡排序）就算失敗，
+結束代碼為 1。查詢的條件和 queries.py 一樣；樣本值取自資料庫裡的第一篇文章與留言，
+資料庫是空的時候用假的值，查詢計畫一樣有意義。
+"""
+
+import argparse
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+import os
+import sys
+from typing import Any
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+from mongo_config import create_client
+from pagination import PageToken, keyset_filter
+from platforms import platform_options
+import search_index
+
+# 每個 collection 需要的索引，以及用到它的畫面
+INDEXES: dict[str, list[IndexModel]] = {
+    "articles": [
+        # 文章列表（由新到舊的 keyset 分頁）、最早 / 最新的文章、每日文章數
+        IndexModel(
+            [("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="created_at_id",
+        ),
+        # 留言探勘用文章 ID 找文章
+        IndexModel([("article_id", ASCENDING)], name="article_id"),
+    ],
+    "comments": [
+        # 留言分頁（由舊到新）、留言統計、整串關鍵字、留言時間分布
+        IndexModel(
+            [("article_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="article_id_created_at_id",
+        ),
+    ],
+    "replies": [
+        # 一次讀取這一頁留言的回覆，依時間排序
+        IndexModel(
+            [
+                ("article_id", ASCENDING),
+                ("comment_id", ASCENDING),
+                ("created_at", ASCENDING),
+            ],
+            name="article_id_comment_id_created_at",
+        ),
+    ],
+}
+
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+# 這些 stage 表示沒有用到索引
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+def create_indexes(db: Database) -> list[str]:
+    messages = []
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                db[collection].create_indexes([index])
+                messages.append(f"{collection}.{index.document['name']}")
+            except OperationFailure as e:
+                # 同樣的欄位已經有索引（名稱或選項不同），沿用既有的
+                if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                    raise
+                messages.append(f"{collection}.{index.document['name']}（已存在）")
+
+    state = search_index.index_state(db)
+    if state is not None:
+        search_index.ensure_indexes(db, bool(state.get("include_content")))
+        messages.append(f"{search_index.SEARCH_COLLECTION}.terms")
+    return messages
+
+
+@dataclass
+class Samples:
+    article_id: ObjectId
+    article_key: str
+    created_at: datetime
+    comment_ids: list[ObjectId]
+
+
+def _samples(db: Database) -> Samples:
+    article = db["articles"].find_one({}, {"article_id": 1, "created_at": 1})
+    if article is None:
+        return Samples(ObjectId(), "", datetime.now(), [ObjectId()])
+
+    comments = (
+        db["comments"]
+        .find({"article_id": article["_id"]}, {"_id": 1})
+        .limit(20)
+        .to_list()
+    )
+    return Samples(
+        article_id=article["_id"],
+        article_key=article.get("article_id") or "",
+        created_at=article.get("created_at") or datetime.now(),
+        comment_ids=[comment["_id"] for comment in comments] or [ObjectId()],
+    )
+
+
+def _find(
+    db: Database,
+    collection: str,
+    query: dict[str, Any],
+    sort: list[tuple[str, int]] | None = None,
+    limit: int = 0,
+) -> dict[str, Any]:
+    cursor = db[collection].find(query, {"_id": 1}).limit(limit)
+    if sort is not None:
+        cursor = cursor.sort(sort)
+    return cursor.explain()
+
+
+def _aggregate(
+    db: Database, collection: str, pipeline: list[dict[str, Any]]
+) -> dict[str, Any]:
+    return db.command(
+        "explain",
+        {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        verbosity="queryPlanner",
+    )
+
+
+def _count(db: Database, collection: str, query: dict[str, Any]) -> dict[str, Any]:
+    # count_documents 就是這個 aggregation
+    return _aggregate(
+        db,
+        collection,
+        [{"$match": query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}],
+    )
+
+
+def page_queries(
+    db: Database, samples: Samples
+) -> dict[str, Callable[[], dict[str, Any]]]:
+    """Explain of every query the pages send, by a readable name"""
+    newest_first = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    oldest_first = [("created_at", ASCENDING), ("_id", ASCENDING)]
+    article_token = PageToken(samples.created_at, samples.article_id)
+    comments_query = {"article_id": samples.article_id}
+    comment_token = PageToken(samples.created_at, samples.comment_ids[0])
+
+    checks: dict[str, Callable[[], dict[str, Any]]] = {
+        "文章列表第一頁": lambda: _find(db, "articles", {}, newest_first, 11),
+        "文章列表下一頁": lambda: _find(
+            db, "articles", keyset_filter(article_token, -1, True), newest_first, 11
+        ),
+        "文章列表上一頁": lambda: _find(
+            db,
+            "articles",
+            keyset_filter(article_token, -1, False),
+            oldest_first,
+            11,
+        ),
+        "文章列表跳至日期": lambda: _find(
+            db,
+            "articles",
+            keyset_filter(PageToken(samples.created_at), -1, True),
+            newest_first,
+            11,
+        ),
+        "跳至日期後確認前一頁": lambda: _find(
+            db, "articles", keyset_filter(article_token, -1, False), limit=1
+        ),
+        "用文章 ID 找文章": lambda: _find(
+            db, "articles", {"article_id": samples.article_key}, limit=1
+        ),
+        "最早的文章": lambda: _find(
+            db, "articles", {}, [("created_at", ASCENDING)], limit=1
+        ),
+        "每日文章數": lambda: _aggregate(
+            db,
+            "articles",
+            [{"$match": {"created_at": {"$gte": samples.created_at}}}],
+        ),
+        "留言數": lambda: _count(db, "comments", comments_query),
+        "留言列表第一頁": lambda: _find(db, "comments", comments_query, oldest_first, 11),
+        "留言列表下一頁": lambda: _find(
+            db,
+            "comments",
+            {"$and": [comments_query, keyset_filter(comment_token, 1, True)]},
+            oldest_first,
+            11,
+        ),
+        "留言統計": lambda: _aggregate(db, "comments", [{"$match": comments_query}]),
+        "留言統計是否過期": lambda: _find(
+            db,
+            "comments",
+            {"article_id": samples.article_id, "_id": {"$gt": samples.comment_ids[0]}},
+            limit=1,
+        ),
+        "這一頁留言的回覆": lambda: _find(
+            db,
+            "replies",
+            {
+                "article_id": samples.article_id,
+                "comment_id": {"$in": samples.comment_ids},
+            },
+            [("created_at", ASCENDING)],
+        ),
+        "回覆數": lambda: _count(db, "replies", comments_query),
+    }
+
+    if search_index.index_state(db) is not None:
+        search = search_index.search_query("台灣")
+        assert search is not None
+        checks["搜尋文章"] = lambda: _find(
+            db, search_index.SEARCH_COLLECTION, search, newest_first, 11
+        )
+        checks["搜尋結果數"] = lambda: _count(db, search_index.SEARCH_COLLECTION, search)
+        # 相關度是算出來的，只能在記憶體裡排序；只檢查找出候選文章的那一段
+        ranked = search_index.ranked_pipeline("台灣", 11)
+        assert ranked is not None
+        checks["依相關度排序"] = lambda: _aggregate(
+            db, search_index.SEARCH_COLLECTION, ranked[:1]
+        )
+
+    return checks
+
+
+def _winning_plans(explain: Any) -> Iterator[dict[str, Any]]:
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            elif key != "rejectedPlans":
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _winning_plans(value)
+
+
+def _stages(plan: Any) -> Iterator[dict[str, Any]]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def plan_summary(explain: dict[str, Any]) -> list[str]:
+    """Stages of the winning plans, e.g. ["LIMIT", "FETCH", "IXSCAN created_at_id"]"""
+    summary = []
+    for plan in _winning_plans(explain):
+        for stage in _stages(plan):
+            name = stage["stage"]
+            if "indexName" in stage:
+                name += f" {stage['indexName']}"
+            summary.append(name)
+    return summary
+
+
+def check_platform(db: Database, verbose: bool) -> int:
+    """Explain every page query; returns the number of plans that scan or sort"""
+    failures = 0
+    for name, explain in page_queries(db, _samples(db)).items():
+        stages = plan_summary(explain())
+        bad = [stage for stage in stages if stage.split(" ")[0] in BAD_STAGES]
+        if bad:
+            failures += 1
+            print(f"  失敗 {name}：{' → '.join(stages)}")
+        elif verbose:
+            print(f"  通過 {name}：{' → '.join(stages)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="建立頁面需要的索引並檢查查詢計畫")
+    parser.add_argument(
+        "--platform",
+        action="append",
+        choices=platform_options(),
+        help="要處理的平台，可重複指定（預設全部）",
+    )
+    parser.add_argument("--no-create", action="store_true", help="不建立索引，只檢查")
+    parser.add_argument("--no-check", action="store_true", help="只建立索引，不檢查")
+    parser.add_argument("--verbose", action="store_true", help="也列出通過的查詢")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    client = create_client(args.mongo_uri)
+
+    failures = 0
+    for platform in args.platform or platform_options():
+        db = client[platform]
+        print(f"{platform}:")
+        if not args.no_create:
+            for message in create_indexes(db):
+                print(f"  索引 {message}")
+        if not args.no_check:
+            failures += check_platform(db, args.verbose)
+
+    if failures:
+        print(f"{failures} 個查詢沒有用到索引（COLLSCAN 或記憶體內 SORT）")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
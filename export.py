@@ -0,0 +1,251 @@
+"""把討論串或整個平台一段期間的資料匯出成 Parquet。
+
+    uv run python export.py --platform ptt --article-id M.1700000000.A.123 --output exports/
+    uv run python export.py --platform ptt --start 2025-01-01 --end 2025-02-01 --output exports/
+
+每個 collection 寫成一個檔案（{平台}_articles.parquet 等）。資料用 find_raw_batches 一批一批
+讀取，每一批直接轉成一個 Arrow record batch 寫出，不建立 DataFrame 或 dataclass，
+記憶體用量只和批次大小有關。整個平台匯出時，先讀一批文章，再讀這些文章的留言與回覆。
+"""
+
+import argparse
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import datetime
+import io
+import os
+import time
+from typing import Any, BinaryIO
+
+from bson import ObjectId
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pymongo import ASCENDING
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from models import (
+    ARTICLE_COLUMNS,
+    COMMENT_COLUMNS,
+    REPLY_COLUMNS,
+    ColumnSpec,
+    decode_raw_batch,
+)
+from mongo_config import BROWSING_READ_PREFERENCE, create_client
+from platforms import platform_options
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_COMPRESSION = "zstd"
+
+SPECS: dict[str, ColumnSpec] = {
+    "articles": ARTICLE_COLUMNS,
+    "comments": COMMENT_COLUMNS,
+    "replies": REPLY_COLUMNS,
+}
+
+# 欄位與 models 的 *_COLUMNS 相同；ObjectId 存成字串，時間是 UTC
+_FIELD_TYPES: dict[str, pa.DataType] = {
+    "created_at": pa.timestamp("ms", tz="UTC"),
+    "likes": pa.int64(),
+    "dislikes": pa.int64(),
+}
+
+SCHEMAS: dict[str, pa.Schema] = {
+    source: pa.schema(
+        [(column, _FIELD_TYPES.get(column, pa.string())) for column in spec]
+    )
+    for source, spec in SPECS.items()
+}
+
+
+def record_batch(documents: list[Mapping[str, Any]], source: str) -> pa.RecordBatch:
+    """Convert documents column by column, with the missing-value rules of models"""
+    spec = SPECS[source]
+    schema = SCHEMAS[source]
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(
+                [spec[field.name](document.get(field.name)) for document in documents],
+                type=field.type,
+            )
+            for field in schema
+        ],
+        schema=schema,
+    )
+
+
+def record_batches(
+    collection: Collection,
+    query: dict[str, Any],
+    source: str,
+    sort: list[tuple[str, int]] | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[pa.RecordBatch]:
+    """One record batch per batch the server returns"""
+    batches = collection.find_raw_batches(
+        query,
+        {column: 1 for column in SPECS[source]},
+        sort=sort,
+        batch_size=batch_size,
+    )
+    for raw in batches:
+        documents = decode_raw_batch(raw)
+        if documents:
+            yield record_batch(documents, source)
+
+
+class ParquetSink:
+    """A ParquetWriter that counts the rows written to it"""
+
+    def __init__(
+        self,
+        where: str | BinaryIO,
+        source: str,
+        compression: str = DEFAULT_COMPRESSION,
+    ):
+        self.writer = pq.ParquetWriter(where, SCHEMAS[source], compression=compression)
+        self.rows = 0
+
+    def write(self, batches: Iterable[pa.RecordBatch]) -> None:
+        for batch in batches:
+            self.writer.write_batch(batch)
+            self.rows += batch.num_rows
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def export_thread(
+    db: Database,
+    article_id: ObjectId,
+    sinks: Mapping[str, ParquetSink],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    """Write the comments and replies of one article to sinks["comments"] / ["replies"]"""
+    # 排序都由 ensure_indexes.py 建立的索引提供，不需要在記憶體裡排序
+    sinks["comments"].write(
+        record_batches(
+            db["comments"],
+            {"article_id": article_id},
+            "comments",
+            sort=[("created_at", ASCENDING), ("_id", ASCENDING)],
+            batch_size=batch_size,
+        )
+    )
+    sinks["replies"].write(
+        record_batches(
+            db["replies"],
+            {"article_id": article_id},
+            "replies",
+            sort=[("comment_id", ASCENDING), ("created_at", ASCENDING)],
+            batch_size=batch_size,
+        )
+    )
+
+
+def export_range(
+    db: Database,
+    start: datetime,
+    end: datetime,
+    sinks: Mapping[str, ParquetSink],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    """Write the articles created in [start, end), then the comments and replies of each batch"""
+    for batch in record_batches(
+        db["articles"],
+        {"created_at": {"$gte": start, "$lt": end}},
+        "articles",
+        sort=[("created_at", ASCENDING), ("_id", ASCENDING)],
+        batch_size=batch_size,
+    ):
+        sinks["articles"].write([batch])
+
+        article_ids = [ObjectId(_id) for _id in batch.column("_id").to_pylist()]
+        for source in ("comments", "replies"):
+            sinks[source].write(
+                record_batches(
+                    db[source],
+                    {"article_id": {"$in": article_ids}},
+                    source,
+                    batch_size=batch_size,
+                )
+            )
+
+
+def thread_parquet(
+    db: Database, article_id: ObjectId, batch_size: int = DEFAULT_BATCH_SIZE
+) -> dict[str, bytes]:
+    """Parquet files of an article's comments and replies, for st.download_button"""
+    buffers = {source: io.BytesIO() for source in ("comments", "replies")}
+    sinks = {source: ParquetSink(buffer, source) for source, buffer in buffers.items()}
+    try:
+        export_thread(db, article_id, sinks, batch_size)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+    return {source: buffer.getvalue() for source, buffer in buffers.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把討論串或一段期間的資料匯出成 Parquet")
+    parser.add_argument("--platform", required=True, choices=platform_options())
+    parser.add_argument("--article-id", help="匯出這篇文章的留言與回覆")
+    parser.add_argument(
+        "--start", type=datetime.fromisoformat, help="匯出這個時間（含）之後的文章"
+    )
+    parser.add_argument(
+        "--end", type=datetime.fromisoformat, help="匯出這個時間（不含）之前的文章"
+    )
+    parser.add_argument("--output", default=".", help="輸出的資料夾")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--compression",
+        default=DEFAULT_COMPRESSION,
+        choices=["zstd", "snappy", "gzip", "none"],
+    )
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    if (args.article_id is None) == (args.start is None or args.end is None):
+        parser.error("請指定 --article-id，或同時指定 --start 與 --end")
+
+    db = create_client(args.mongo_uri, BROWSING_READ_PREFERENCE)[args.platform]
+    os.makedirs(args.output, exist_ok=True)
+
+    if args.article_id is not None:
+        article = db["articles"].find_one({"article_id": args.article_id}, {"_id": 1})
+        if article is None:
+            parser.error(f"找不到 ID 為 {args.article_id} 的文章")
+        sources = ["comments", "replies"]
+        prefix = f"{args.platform}_{args.article_id}"
+    else:
+        sources = ["articles", "comments", "replies"]
+        prefix = args.platform
+
+    sinks = {
+        source: ParquetSink(
+            os.path.join(args.output, f"{prefix}_{source}.parquet"),
+            source,
+            args.compression,
+        )
+        for source in sources
+    }
+
+    started_at = time.perf_counter()
+    try:
+        if args.article_id is not None:
+            export_thread(db, article["_id"], sinks, args.batch_size)
+        else:
+            export_range(db, args.start, args.end, sinks, args.batch_size)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+    elapsed = time.perf_counter() - started_at
+
+    for source, sink in sinks.items():
+        print(f"{prefix}_{source}.parquet: {sink.rows} 筆")
+    rows = sum(sink.rows for sink in sinks.values())
+    print(f"共 {rows} 筆，耗時 {elapsed:.1f} 秒（每秒 {rows / max(elapsed, 1e-9):.0f} 筆）")
+
+
+if __name__ == "__main__":
+    main()
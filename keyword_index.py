@@ -0,0 +1,188 @@
+"""每個平台的文件頻率（document frequency）表，用 TF-IDF 挑關鍵字。
+
+    uv run python keyword_index.py                  # 所有平台，併入上次之後新斷詞的文件
+    uv run python keyword_index.py --source comments --platform ptt
+    uv run python keyword_index.py --full           # 清掉重算
+
+只看詞頻時，關鍵字常常是整個平台都很常見的詞。這裡從 tokenize_corpus.py 算好的
+article_terms / comment_terms 統計每個詞出現在幾篇文件裡，存在 article_df / comment_df，
+進度記在 pipeline_state，重跑時只處理新文件。中斷時最多重複計算一批，需要時用 --full 重建。
+"""
+
+import argparse
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass
+from itertools import islice
+import os
+import time
+from typing import Any
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from mongo_config import create_client
+from platforms import platform_options
+from terms import TERM_COLLECTIONS
+from watermark import get_state, reset_watermark, set_watermark
+
+DF_COLLECTIONS = {
+    "articles": "article_df",
+    "comments": "comment_df",
+}
+
+# 只出現在一篇文件裡的詞多半是錯字或專有名詞，不載入記憶體，當作 df = 1
+MIN_DF = 2
+
+
+def watermark_name(source: str) -> str:
+    return f"df:{source}"
+
+
+def update_document_frequencies(
+    db: Database, source: str, chunk_size: int = 5000
+) -> int:
+    """Fold the documents tokenized since the last run into the df table"""
+    query: dict[str, Any] = {}
+    state = get_state(db, watermark_name(source))
+    if state is not None:
+        query["_id"] = {"$gt": state["watermark"]}
+    total_documents = state["documents"] if state is not None else 0
+
+    documents = db[TERM_COLLECTIONS[source]].find(
+        query, {"terms": 1}, sort=[("_id", 1)], batch_size=chunk_size
+    )
+
+    processed = 0
+    while chunk := list(islice(documents, chunk_size)):
+        # 每篇文件裡的詞只算一次
+        frequencies = Counter(
+            word for document in chunk for word, _ in document["terms"]
+        )
+        if frequencies:
+            db[DF_COLLECTIONS[source]].bulk_write(
+                [
+                    UpdateOne({"_id": word}, {"$inc": {"df": df}}, upsert=True)
+                    for word, df in frequencies.items()
+                ],
+                ordered=False,
+            )
+
+        total_documents += len(chunk)
+        set_watermark(
+            db, watermark_name(source), chunk[-1]["_id"], documents=total_documents
+        )
+        processed += len(chunk)
+
+    return processed
+
+
+def reset_document_frequencies(db: Database, source: str) -> None:
+    db[DF_COLLECTIONS[source]].drop()
+    reset_watermark(db, watermark_name(source))
+
+
+@dataclass
+class IdfTable:
+    """BM25-style idf of every word with df >= MIN_DF, looked up by word"""
+
+    documents: int
+    index: dict[str, int]
+    idf: np.ndarray
+    unseen_idf: float
+
+    def lookup(self, words: list[str]) -> np.ndarray:
+        positions = np.fromiter(
+            (self.index.get(word, -1) for word in words),
+            dtype=np.int64,
+            count=len(words),
+        )
+        # 表裡沒有的詞（df < MIN_DF）給最高的 idf
+        return np.where(positions >= 0, self.idf[positions], self.unseen_idf)
+
+
+def _idf(documents: int, df: np.ndarray | float) -> Any:
+    return np.log((documents - df + 0.5) / (df + 0.5) + 1.0)
+
+
+def load_idf_table(db: Database, source: str) -> IdfTable | None:
+    """Read the df table into arrays, None when keyword_index.py has not run yet"""
+    state = get_state(db, watermark_name(source))
+    if state is None or not state.get("documents"):
+        return None
+
+    index: dict[str, int] = {}
+    frequencies: list[int] = []
+    for position, entry in enumerate(
+        db[DF_COLLECTIONS[source]].find({"df": {"$gte": MIN_DF}}, batch_size=10_000)
+    ):
+        index[entry["_id"]] = position
+        frequencies.append(entry["df"])
+
+    documents = state["documents"]
+    return IdfTable(
+        documents=documents,
+        index=index,
+        # 多一格給查不到的詞（位置 -1），實際值由 unseen_idf 取代
+        idf=np.append(_idf(documents, np.asarray(frequencies, dtype=np.float64)), 0.0),
+        unseen_idf=float(_idf(documents, 1.0)),
+    )
+
+
+def tfidf_keywords(
+    word_counts: Mapping[str, int], table: IdfTable, k: int = 5
+) -> list[str]:
+    """The k words with the highest (1 + log tf) * idf, most important first"""
+    if not word_counts:
+        return []
+
+    words = list(word_counts)
+    tf = np.fromiter(word_counts.values(), dtype=np.float64, count=len(words))
+    scores = (1.0 + np.log(tf)) * table.lookup(words)
+
+    if len(words) > k:
+        # 只挑出前 k 名，不排序整個陣列
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(len(words))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [words[i] for i in top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="更新各平台的文件頻率表")
+    parser.add_argument(
+        "--platform",
+        action="append",
+        choices=platform_options(),
+        help="要處理的平台，可重複指定（預設全部）",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        choices=list(DF_COLLECTIONS),
+        help="要處理的 collection，可重複指定（預設全部）",
+    )
+    parser.add_argument("--full", action="store_true", help="清掉既有的表後重算")
+    parser.add_argument(
+        "--chunk-size", type=int, default=5000, help="每次讀取並寫回的文件數"
+    )
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    client = create_client(args.mongo_uri)
+    for platform in args.platform or platform_options():
+        db = client[platform]
+        for source in args.source or list(DF_COLLECTIONS):
+            if args.full:
+                reset_document_frequencies(db, source)
+
+            started_at = time.perf_counter()
+            processed = update_document_frequencies(db, source, args.chunk_size)
+            elapsed = time.perf_counter() - started_at
+            print(f"{platform}.{source}: {processed} 篇，耗時 {elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
+from collections.abc import Callable, Iterable, Mapping, Sequence
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Literal, NotRequired, TypedDict
+from itertools import islice
+from typing import Any, Literal, NotRequired, TypedDict
+import bson
 from bson import ObjectId
+from bson.codec_options import CodecOptions
+import pandas as pd
 
 
 class ArticleMongoModel(TypedDict):
@@ -13,26 +18,27 @@ class ArticleMongoModel(TypedDict):
     content: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Article:
     _id: str | None
     article_id: str
     url: str
     title: str
-    created_at: datetime
+    created_at: datetime | None
     content: str
 
 
 def article_from_mongo_model(mongo_model: ArticleMongoModel) -> Article:
+    """查詢時可以只投影部分欄位，沒有讀取的字串欄位為空字串"""
     assert "_id" in mongo_model, "mongo_model 必須包含 _id 欄位"
 
     return Article(
         _id=str(mongo_model["_id"]),
-        article_id=mongo_model["article_id"],
-        url=mongo_model["url"],
-        title=mongo_model["title"],
-        created_at=mongo_model["created_at"],
-        content=mongo_model["content"],
+        article_id=mongo_model.get("article_id", ""),
+        url=mongo_model.get("url", ""),
+        title=mongo_model.get("title", ""),
+        created_at=mongo_model.get("created_at"),
+        content=mongo_model.get("content", ""),
     )
 
 
@@ -48,13 +54,13 @@ class CommentMongoModel(TypedDict):
     reaction_type: Literal["+1", "-1", "0"] | None
 
 
-@dataclass
+@dataclass(slots=True)
 class Comment:
     _id: str | None
     article_id: str
     comment_id: str
     content: str
-    created_at: datetime
+    created_at: datetime | None
     author: str
     likes: int = 0
     dislikes: int = 0
@@ -62,15 +68,16 @@ class Comment:
 
 
 def comment_from_mongo_model(mongo_model: CommentMongoModel) -> Comment:
+    """查詢時可以只投影部分欄位，沒有讀取的字串欄位為空字串"""
     assert "_id" in mongo_model, "mongo_model 必須包含 _id 欄位"
 
     return Comment(
         _id=str(mongo_model["_id"]),
-        article_id=str(mongo_model["article_id"]),
-        comment_id=mongo_model["comment_id"],
-        content=mongo_model["content"],
-        created_at=mongo_model["created_at"],
-        author=mongo_model["author"],
+        article_id=_object_id_str(mongo_model.get("article_id")) or "",
+        comment_id=mongo_model.get("comment_id", ""),
+        content=mongo_model.get("content", ""),
+        created_at=mongo_model.get("created_at"),
+        author=mongo_model.get("author", ""),
         likes="likes" in mongo_model and mongo_model["likes"] or 0,
         dislikes="dislikes" in mongo_model and mongo_model["dislikes"] or 0,
         reaction_type="reaction_type" in mongo_model
@@ -92,14 +99,14 @@ class ReplyMongoModel(TypedDict):
     reaction_type: Literal["+1", "-1", "0"] | None
 
 
-@dataclass
+@dataclass(slots=True)
 class Reply:
     _id: str | None
     article_id: str
     comment_id: str
     reply_id: str
     content: str
-    created_at: datetime
+    created_at: datetime | None
     author: str
     likes: int = 0
     dislikes: int = 0
@@ -107,19 +114,126 @@ class Reply:
 
 
 def reply_from_mongo_model(mongo_model: ReplyMongoModel) -> Reply:
+    """查詢時可以只投影部分欄位，沒有讀取的字串欄位為空字串"""
     assert "_id" in mongo_model, "mongo_model 必須包含 _id 欄位"
 
     return Reply(
         _id=str(mongo_model["_id"]),
-        article_id=str(mongo_model["article_id"]),
-        comment_id=str(mongo_model["comment_id"]),
-        reply_id=mongo_model["reply_id"],
-        content=mongo_model["content"],
-        created_at=mongo_model["created_at"],
-        author=mongo_model["author"],
+        article_id=_object_id_str(mongo_model.get("article_id")) or "",
+        comment_id=_object_id_str(mongo_model.get("comment_id")) or "",
+        reply_id=mongo_model.get("reply_id", ""),
+        content=mongo_model.get("content", ""),
+        created_at=mongo_model.get("created_at"),
+        author=mongo_model.get("author", ""),
         likes="likes" in mongo_model and mongo_model["likes"] or 0,
         dislikes="dislikes" in mongo_model and mongo_model["dislikes"] or 0,
         reaction_type="reaction_type" in mongo_model
         and mongo_model["reaction_type"]
         or "0",
     )
+
+
+# 直接把查詢結果轉成 DataFrame，不經過每筆文件一個 dataclass。
+# 每個欄位對應一個轉換函式，缺值的處理規則與上面的 *_from_mongo_model 相同。
+
+
+def _object_id_str(value: Any) -> str | None:
+    return None if value is None else str(value)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _count(value: int | None) -> int:
+    return value or 0
+
+
+def _reaction_type(value: str | None) -> str:
+    return value or "0"
+
+
+ColumnSpec = dict[str, Callable[[Any], Any]]
+
+ARTICLE_COLUMNS: ColumnSpec = {
+    "_id": _object_id_str,
+    "article_id": _identity,
+    "url": _identity,
+    "title": _identity,
+    "created_at": _identity,
+    "content": _identity,
+}
+
+COMMENT_COLUMNS: ColumnSpec = {
+    "_id": _object_id_str,
+    "article_id": _object_id_str,
+    "comment_id": _identity,
+    "content": _identity,
+    "created_at": _identity,
+    "author": _identity,
+    "likes": _count,
+    "dislikes": _count,
+    "reaction_type": _reaction_type,
+}
+
+REPLY_COLUMNS: ColumnSpec = {
+    "_id": _object_id_str,
+    "article_id": _object_id_str,
+    "comment_id": _object_id_str,
+    "reply_id": _identity,
+    "content": _identity,
+    "created_at": _identity,
+    "author": _identity,
+    "likes": _count,
+    "dislikes": _count,
+    "reaction_type": _reaction_type,
+}
+
+# 與 MongoClient 預設相同：datetime 解成 naive UTC
+_RAW_BATCH_CODEC_OPTIONS: CodecOptions = CodecOptions(tz_aware=False)
+
+
+def frame_from_documents(
+    documents: Iterable[Mapping[str, Any]],
+    spec: ColumnSpec,
+    columns: Sequence[str] | None = None,
+    batch_size: int = 1000,
+) -> pd.DataFrame:
+    """Build a DataFrame column by column straight from MongoDB documents"""
+    columns = list(columns or spec)
+    values: dict[str, list[Any]] = {column: [] for column in columns}
+
+    documents_iter = iter(documents)
+    while batch := list(islice(documents_iter, batch_size)):
+        for column in columns:
+            convert = spec[column]
+            values[column].extend([convert(document.get(column)) for document in batch])
+
+    frame = pd.DataFrame(values, columns=columns)
+    for column in ("likes", "dislikes"):
+        if column in frame:
+            frame[column] = frame[column].astype("int64")
+    return frame
+
+
+def decode_raw_batch(batch: bytes) -> list[dict[str, Any]]:
+    """Documents of one raw BSON batch from Collection.find_raw_batches"""
+    return bson.decode_all(batch, _RAW_BATCH_CODEC_OPTIONS)
+
+
+def articles_frame(
+    documents: Iterable[ArticleMongoModel], columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+    return frame_from_documents(documents, ARTICLE_COLUMNS, columns)
+
+
+def comments_frame(
+    documents: Iterable[CommentMongoModel], columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+    return frame_from_documents(documents, COMMENT_COLUMNS, columns)
+
+
+def replies_frame(
+    documents: Iterable[ReplyMongoModel], columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+    return frame_from_documents(documents, REPLY_COLUMNS, columns)
@@ -0,0 +1,83 @@
+"""MongoClient 的連線設定，由環境變數決定。
+
+    MONGO_URI                            連線字串
+    MONGO_MAX_POOL_SIZE                  每個伺服器的最大連線數（pymongo 預設 100）
+    MONGO_MIN_POOL_SIZE                  保持開啟的連線數（預設 0）
+    MONGO_SERVER_SELECTION_TIMEOUT_MS    找不到可用伺服器時等待多久（預設 30000）
+    MONGO_CONNECT_TIMEOUT_MS             建立連線的逾時（預設 20000）
+    MONGO_SOCKET_TIMEOUT_MS              等待回應的逾時（預設不限）
+    MONGO_COMPRESSORS                    傳輸壓縮，依偏好排列（預設 zstd,snappy,zlib；none 關閉）
+    MONGO_ZLIB_LEVEL                     zlib 壓縮等級 -1 ~ 9
+    MONGO_READ_PREFERENCE                瀏覽頁面與匯出的讀取偏好（預設 secondaryPreferred）
+
+沒有設定的項目不傳給 MongoClient，以連線字串裡的設定或 pymongo 的預設為準；
+讀取偏好與壓縮則一律以這裡的設定為準；其他命令列工具固定用 primary。
+文章與留言都是大段文字，壓縮通常能大幅減少傳輸量；實際效果用 bench_compression.py 量測。
+zstd 與 snappy 需要額外的 Python 套件，沒有安裝時自動略過，連線時和伺服器協商用哪一種。
+"""
+
+from collections.abc import Sequence
+import os
+from typing import Any
+import warnings
+
+from pymongo import MongoClient
+from pymongo.compression_support import validate_compressors
+
+DEFAULT_COMPRESSORS = ["zstd", "snappy", "zlib"]
+
+# 瀏覽頁面只讀取資料，可以接受次要節點稍微落後。
+# 命令列工具要讀取並推進 pipeline_state 的進度，一律用 primary，不受環境變數影響
+BROWSING_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE") or "secondaryPreferred"
+
+_INT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_ZLIB_LEVEL": "zlibCompressionLevel",
+}
+
+
+def available_compressors(names: Sequence[str]) -> list[str]:
+    """The compressors among names that this Python environment can use"""
+    with warnings.catch_warnings():
+        # 缺少套件時 pymongo 會警告並移除，這裡只需要結果
+        warnings.simplefilter("ignore")
+        return validate_compressors(None, list(names))
+
+
+def compressors_from_env() -> list[str]:
+    value = os.getenv("MONGO_COMPRESSORS")
+    if value is None:
+        return available_compressors(DEFAULT_COMPRESSORS)
+    if value.strip().lower() in ("", "none"):
+        return []
+    return available_compressors([name.strip() for name in value.split(",")])
+
+
+def client_options(read_preference: str = "primary") -> dict[str, Any]:
+    """MongoClient keyword arguments from the MONGO_* environment variables"""
+    options: dict[str, Any] = {}
+    for variable, option in _INT_OPTIONS.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = int(value)
+
+    compressors = compressors_from_env()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+
+    options["readPreference"] = read_preference
+    return options
+
+
+def create_client(
+    uri: str | None = None, read_preference: str = "primary", **kwargs: Any
+) -> MongoClient:
+    """MongoClient configured from the environment; kwargs win over it"""
+    return MongoClient(
+        uri if uri is not None else os.getenv("MONGO_URI"),
+        **{**client_options(read_preference), **kwargs},
+    )
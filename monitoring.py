@@ -0,0 +1,331 @@
+"""MongoDB 指令與每次重跑的耗時監控。
+
+    APP_MONITOR=1 uv run streamlit run streamlit_app.py
+
+開啟後 components.get_database_client 建立的 client 會掛上 CommandRecorder，記錄每個送到
+MongoDB 的指令的耗時、回傳的文件數與大小；頁面裡的斷詞、關鍵字與文字雲用 stage() 計時，
+每次重跑用 track_rerun() 計時。側邊欄的「MongoDB 監控」列出這一頁最慢的查詢，
+並可下載 JSON 或 Prometheus 文字格式的統計。
+"""
+
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import threading
+import time
+from typing import Any, TypeVar
+
+import bson
+from bson import json_util
+from pymongo import monitoring
+
+ENABLED = os.getenv("APP_MONITOR") == "1"
+
+# 記憶體裡保留最近的指令與重跑筆數
+MAX_COMMANDS = 2000
+MAX_RERUNS = 200
+
+# 指令內容只保留前面這麼多字，夠看出是哪個查詢
+COMMAND_SUMMARY_LENGTH = 300
+
+# 不影響查詢結果、只會讓摘要變長的欄位
+_IGNORED_FIELDS = {"$db", "lsid", "$clusterTime", "$readPreference", "txnNumber"}
+
+# 重跑以外（例如 thread pool 裡）送出的指令
+BACKGROUND = "（背景）"
+
+
+@dataclass
+class CommandRecord:
+    page: str
+    command: str
+    collection: str
+    summary: str
+    started_at: datetime
+    seconds: float
+    documents: int
+    reply_bytes: int
+    failed: bool = False
+
+
+@dataclass
+class RerunRecord:
+    page: str
+    started_at: datetime
+    seconds: float = 0.0
+    stages: dict[str, float] = field(default_factory=dict)
+    commands: int = 0
+    command_seconds: float = 0.0
+
+
+@dataclass
+class _Totals:
+    count: int = 0
+    seconds: float = 0.0
+    documents: int = 0
+    reply_bytes: int = 0
+    failures: int = 0
+
+
+_commands: deque[CommandRecord] = deque(maxlen=MAX_COMMANDS)
+_reruns: deque[RerunRecord] = deque(maxlen=MAX_RERUNS)
+# Prometheus 的 counter 要一直累加，不能只看最近的紀錄
+_command_totals: defaultdict[tuple[str, str, str], _Totals] = defaultdict(_Totals)
+_stage_totals: defaultdict[tuple[str, str], _Totals] = defaultdict(_Totals)
+_rerun_totals: defaultdict[str, _Totals] = defaultdict(_Totals)
+_lock = threading.Lock()
+
+# 目前這個執行緒正在跑的重跑；Streamlit 每個 session 的重跑在自己的執行緒裡
+_local = threading.local()
+
+
+def _current_rerun() -> RerunRecord | None:
+    return getattr(_local, "rerun", None)
+
+
+T = TypeVar("T")
+
+
+def bind_rerun(function: Callable[..., T]) -> Callable[..., T]:
+    """Count the commands function sends from a worker thread in the current rerun"""
+    rerun = _current_rerun()
+    if rerun is None:
+        return function
+
+    def bound(*args: Any, **kwargs: Any) -> T:
+        previous = _current_rerun()
+        _local.rerun = rerun
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.rerun = previous
+
+    return bound
+
+
+def _collection_name(command_name: str, command: dict[str, Any]) -> str:
+    if command_name == "getMore":
+        return str(command.get("collection", ""))
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _summary(command: dict[str, Any]) -> str:
+    text = json_util.dumps(
+        {key: value for key, value in command.items() if key not in _IGNORED_FIELDS},
+        ensure_ascii=False,
+    )
+    if len(text) > COMMAND_SUMMARY_LENGTH:
+        text = text[:COMMAND_SUMMARY_LENGTH] + "…"
+    return text
+
+
+def _documents(reply: dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+        return len(batch)
+    return 0
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Record latency, returned documents and reply size of every command"""
+
+    def __init__(self):
+        self._pending: dict[tuple[Any, int], tuple[RerunRecord | None, str, str]] = {}
+        self._pending_lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # started 和 succeeded 在送出指令的執行緒裡呼叫，這時可以知道是哪一次重跑
+        with self._pending_lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                _current_rerun(),
+                _collection_name(event.command_name, event.command),
+                _summary(event.command),
+            )
+
+    def _finish(
+        self,
+        event: monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent,
+        reply: dict[str, Any],
+        failed: bool,
+    ) -> None:
+        with self._pending_lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        rerun, collection, summary = pending
+
+        record = CommandRecord(
+            page=rerun.page if rerun is not None else BACKGROUND,
+            command=event.command_name,
+            collection=collection,
+            summary=summary,
+            started_at=datetime.now(timezone.utc)
+            - timedelta(microseconds=event.duration_micros),
+            seconds=event.duration_micros / 1e6,
+            documents=_documents(reply),
+            reply_bytes=len(bson.encode(reply)) if reply else 0,
+            failed=failed,
+        )
+        with _lock:
+            _commands.append(record)
+            totals = _command_totals[(record.page, record.command, collection)]
+            totals.count += 1
+            totals.seconds += record.seconds
+            totals.documents += record.documents
+            totals.reply_bytes += record.reply_bytes
+            totals.failures += failed
+            if rerun is not None:
+                rerun.commands += 1
+                rerun.command_seconds += record.seconds
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, event.reply, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, {}, failed=True)
+
+
+def event_listeners() -> list[monitoring.CommandListener]:
+    """Listeners to pass to MongoClient; empty unless APP_MONITOR=1"""
+    return [CommandRecorder()] if ENABLED else []
+
+
+@contextmanager
+def track_rerun(page: str) -> Iterator[None]:
+    """Time one rerun of a page and attribute the commands it sends to it"""
+    if not ENABLED:
+        yield
+        return
+
+    rerun = RerunRecord(page, datetime.now(timezone.utc))
+    _local.rerun = rerun
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        # st.rerun() / st.stop() 也是以例外結束，一樣記錄
+        rerun.seconds = time.perf_counter() - started_at
+        _local.rerun = None
+        with _lock:
+            _reruns.append(rerun)
+            totals = _rerun_totals[page]
+            totals.count += 1
+            totals.seconds += rerun.seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage (NLP, word cloud, ...) of the current rerun"""
+    rerun = _current_rerun()
+    if rerun is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        with _lock:
+            rerun.stages[name] = rerun.stages.get(name, 0.0) + elapsed
+            totals = _stage_totals[(rerun.page, name)]
+            totals.count += 1
+            totals.seconds += elapsed
+
+
+def last_rerun(page: str) -> RerunRecord | None:
+    with _lock:
+        for rerun in reversed(_reruns):
+            if rerun.page == page:
+                return rerun
+    return None
+
+
+def slowest_commands(page: str | None = None, limit: int = 10) -> list[CommandRecord]:
+    """The slowest recent commands, of one page or of all of them"""
+    with _lock:
+        commands = [
+            command for command in _commands if page is None or command.page == page
+        ]
+    return sorted(commands, key=lambda command: command.seconds, reverse=True)[:limit]
+
+
+def to_json() -> str:
+    """Recent reruns and the slowest recent commands of every page"""
+    with _lock:
+        pages = sorted({command.page for command in _commands})
+        reruns = [asdict(rerun) for rerun in _reruns]
+    return json.dumps(
+        {
+            "slowest_commands": {
+                page: [asdict(command) for command in slowest_commands(page)]
+                for page in pages
+            },
+            "reruns": reruns,
+        },
+        ensure_ascii=False,
+        default=str,
+        indent=2,
+    )
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return (
+        "{"
+        + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items())
+        + "}"
+    )
+
+
+def to_prometheus() -> str:
+    """Cumulative totals in the Prometheus text exposition format"""
+    lines = [
+        "# HELP app_mongo_command_seconds Latency of MongoDB commands",
+        "# TYPE app_mongo_command_seconds summary",
+    ]
+    with _lock:
+        commands = sorted(_command_totals.items())
+        stages = sorted(_stage_totals.items())
+        reruns = sorted(_rerun_totals.items())
+
+    for (page, command, collection), totals in commands:
+        labels = _labels(page=page, command=command, collection=collection)
+        lines.append(f"app_mongo_command_seconds_sum{labels} {totals.seconds:.6f}")
+        lines.append(f"app_mongo_command_seconds_count{labels} {totals.count}")
+
+    for name, attribute, help_text in [
+        ("app_mongo_documents_total", "documents", "Documents returned by MongoDB"),
+        ("app_mongo_reply_bytes_total", "reply_bytes", "BSON bytes of MongoDB replies"),
+        ("app_mongo_command_failures_total", "failures", "Failed MongoDB commands"),
+    ]:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (page, command, collection), totals in commands:
+            labels = _labels(page=page, command=command, collection=collection)
+            lines.append(f"{name}{labels} {getattr(totals, attribute)}")
+
+    lines.append("# HELP app_stage_seconds Time spent in page stages")
+    lines.append("# TYPE app_stage_seconds summary")
+    for (page, stage_name), totals in stages:
+        labels = _labels(page=page, stage=stage_name)
+        lines.append(f"app_stage_seconds_sum{labels} {totals.seconds:.6f}")
+        lines.append(f"app_stage_seconds_count{labels} {totals.count}")
+
+    lines.append("# HELP app_rerun_seconds Time of Streamlit reruns")
+    lines.append("# TYPE app_rerun_seconds summary")
+    for page, totals in reruns:
+        labels = _labels(page=page)
+        lines.append(f"app_rerun_seconds_sum{labels} {totals.seconds:.6f}")
+        lines.append(f"app_rerun_seconds_count{labels} {totals.count}")
+
+    return "\n".join(lines) + "\n"
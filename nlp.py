@@ -1,13 +1,21 @@
 from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
 import functools
+from itertools import islice
 from glob import glob
+import hashlib
+import heapq
+import io
 import json
 import string
-import hanlp
-import hanlp.pretrained
-import wordcloud
+import threading
+import time
+from typing import Literal
 
 import cleaner
+import monitoring
+from nlp_cache import SegmentCache, default_segment_cache
 
 # https://hanlp.hankcs.com/docs/annotations/pos/ctb.html
 ACCEPTED_POS = [
@@ -22,52 +30,305 @@ ACCEPTED_POS = [
     "VV"
 ]
 
+# 一次送進斷詞器 / 詞性標註器的文件數
+DEFAULT_BATCH_SIZE = 32
+
+# hanlp.pretrained 裡的模型名稱。import hanlp 會載入整套深度學習套件，
+# 所以這個模組不在開頭 import，建立 Nlp 時才解析成模型網址
+TOKENIZER_MODEL = "tok.COARSE_ELECTRA_SMALL_ZH"
+POS_TAGGER_MODEL = "pos.CTB9_POS_ELECTRA_SMALL"
+
+# 清理或過濾規則改變、但模型與停用詞都沒變時，調高這個數字讓斷詞快取失效
+SEGMENT_VERSION = 1
+
+
+@functools.cache
+def load_stopwords() -> frozenset[str]:
+    """Read every stopwords/*.json once per process"""
+    stopwords = set()
+    for path in glob("./stopwords/*.json"):
+        with open(path, "r") as f:
+            stopwords.update(json.load(f))
+
+    stopwords.update(string.punctuation + string.whitespace)
+
+    return frozenset(stopwords)
+
+
+@dataclass
+class WordCounts:
+    documents: list[Counter[str]]
+    total: Counter[str]
+
+
+def _pretrained_model(name: str) -> str:
+    import hanlp.pretrained
+
+    return functools.reduce(getattr, name.split("."), hanlp.pretrained)
+
+
 class Nlp:
-    def __init__(self):
+    def __init__(self, cache: SegmentCache | None = None):
+        import hanlp
+
         self.cleaner = cleaner.BasicCleaner()
-        self.segmenter = hanlp.load(hanlp.pretrained.tok.COARSE_ELECTRA_SMALL_ZH)
-        self.pos_tagger = hanlp.load(hanlp.pretrained.pos.CTB9_POS_ELECTRA_SMALL)
+        self.tokenizer_model = _pretrained_model(TOKENIZER_MODEL)
+        self.pos_tagger_model = _pretrained_model(POS_TAGGER_MODEL)
+        self.segmenter = hanlp.load(self.tokenizer_model)
+        self.pos_tagger = hanlp.load(self.pos_tagger_model)
+        self.cache = cache
 
-    @functools.cached_property
-    def stopwords(self) -> set[str]:
-        stopwords = set()
-        for path in glob("./stopwords/*.json"):
-            with open(path, "r") as f:
-                stopwords.update(json.load(f))
+        # 同一個實例會被所有 session 共用，推論時一次只讓一個執行緒進入模型
+        self._inference_lock = threading.Lock()
+
+    @property
+    def stopwords(self) -> frozenset[str]:
+        return load_stopwords()
 
-        stopwords.update(string.punctuation + string.whitespace)
+    @functools.cached_property
+    def cache_namespace(self) -> str:
+        """Identify the model, stopword and filter versions that produced a cached result"""
+        stopwords_digest = hashlib.sha256(
+            "\n".join(sorted(self.stopwords)).encode()
+        ).hexdigest()
 
-        return stopwords
+        return json.dumps(
+            [
+                SEGMENT_VERSION,
+                self.tokenizer_model,
+                self.pos_tagger_model,
+                ACCEPTED_POS,
+                stopwords_digest,
+            ]
+        )
 
     def segment(self, text: str) -> list[str]:
-        normalized_text = self.cleaner.clean_text(text)
-        segmented = self.segmenter(normalized_text)
+        return self.segment_many([text])[0]
 
-        # filter out stopwords
-        segmented_cleaned = [word for word in segmented if word not in self.stopwords]
+    def segment_many(
+        self, texts: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> list[list[str]]:
+        """Segment each text separately, feeding the models batch_size texts at a time"""
+        results: list[list[str]] = []
 
-        # tag pos
-        pos = self.pos_tagger(segmented_cleaned)
+        texts_iter = iter(texts)
+        while batch := list(islice(texts_iter, batch_size)):
+            if self.cache is None:
+                results.extend(self._segment_batch(batch))
+            else:
+                results.extend(self._segment_batch_cached(batch))
 
-        # filter out words that are not in the accepted pos
-        return [word for word, p in zip(segmented_cleaned, pos) if p in ACCEPTED_POS]
+        return results
+
+    def _segment_batch_cached(self, texts: list[str]) -> list[list[str]]:
+        keys = [SegmentCache.make_key(self.cache_namespace, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # 同一批裡重複的文字只算一次
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            computed = dict(zip(missing, self._segment_batch(list(missing.values()))))
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def _segment_batch(self, texts: list[str]) -> list[list[str]]:
+        normalized_texts = [self.cleaner.clean_text(text) for text in texts]
+
+        # 空字串不送進模型
+        indices = [i for i, text in enumerate(normalized_texts) if text]
+        results: list[list[str]] = [[] for _ in texts]
+        if not indices:
+            return results
+
+        batch_size = len(indices)
+        with self._inference_lock:
+            segmented = self.segmenter(
+                [normalized_texts[i] for i in indices], batch_size=batch_size
+            )
+
+            # filter out stopwords
+            segmented_cleaned = [
+                [word for word in words if word not in self.stopwords]
+                for words in segmented
+            ]
+
+            # tag pos（沒有剩下任何詞的文件不用標註）
+            to_tag = [words for words in segmented_cleaned if words]
+            pos = iter(self.pos_tagger(to_tag, batch_size=batch_size) if to_tag else [])
+
+        for i, words in zip(indices, segmented_cleaned):
+            if not words:
+                continue
+
+            # filter out words that are not in the accepted pos
+            results[i] = [word for word, p in zip(words, next(pos)) if p in ACCEPTED_POS]
+
+        return results
 
     def word_count(self, text: str) -> dict[str, int]:
         words = self.segment(text)
         return Counter(words)
 
-    def keywords(self, word_counts: dict[str, int]) -> list[str]:
-        # find the most 5 frequent words
-        most_frequent_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        return [word for word, _ in most_frequent_words]
-
-    def word_cloud(self, word_counts: dict[str, int]) -> str:
-        wc = wordcloud.WordCloud(
-            font_path="./fonts/arial-unicode.ttf",
-            width=1024,
-            height=768,
-            random_state=42,
+    def word_count_many(
+        self, texts: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> WordCounts:
+        """Count words per text and across all texts"""
+        documents = [Counter(words) for words in self.segment_many(texts, batch_size)]
+
+        total: Counter[str] = Counter()
+        for counts in documents:
+            total.update(counts)
+
+        return WordCounts(documents=documents, total=total)
+
+    def keywords(self, word_counts: dict[str, int], k: int = 5) -> list[str]:
+        return keywords(word_counts, k)
+
+    def word_cloud(
+        self, word_counts: dict[str, int], image_format: "WordCloudFormat" = "webp"
+    ) -> str | bytes:
+        return word_cloud(word_counts, image_format)
+
+
+# 關鍵字與文字雲只需要詞頻，不用等模型載入（例如詞頻已經離線算好時）
+def keywords(word_counts: dict[str, int], k: int = 5) -> list[str]:
+    # find the k most frequent words (heap selection, no full sort)
+    most_frequent_words = heapq.nlargest(k, word_counts.items(), key=lambda x: x[1])
+    return [word for word, _ in most_frequent_words]
+
+
+FONT_PATH = "./fonts/arial-unicode.ttf"
+
+# 文字雲最多放的詞數：排版時間和詞數成正比，大討論串也不會變慢
+WORD_CLOUD_MAX_WORDS = 200
+
+WordCloudFormat = Literal["svg", "png", "webp"]
+
+
+def word_cloud(
+    word_counts: dict[str, int],
+    image_format: WordCloudFormat = "webp",
+    max_words: int = WORD_CLOUD_MAX_WORDS,
+    width: int = 1024,
+    height: int = 768,
+) -> str | bytes:
+    """Render the most frequent words; returns SVG markup or PNG / WebP bytes for st.image
+
+    同樣的詞頻與參數只排版一次，之後直接回傳快取的圖。
+    """
+    # 依次數、再依詞排序，同樣的詞頻一定得到同樣的快取 key
+    frequencies = tuple(
+        heapq.nsmallest(
+            max_words, word_counts.items(), key=lambda item: (-item[1], item[0])
         )
-        wc.generate_from_frequencies(word_counts)
+    )
+    with monitoring.stage("文字雲"):
+        return _render_word_cloud(frequencies, image_format, width, height)
+
+
+# 一張圖約幾百 KB，只留最近用到的幾十張
+@functools.lru_cache(maxsize=32)
+def _render_word_cloud(
+    frequencies: tuple[tuple[str, int], ...],
+    image_format: WordCloudFormat,
+    width: int,
+    height: int,
+) -> str | bytes:
+    import wordcloud
+
+    wc = wordcloud.WordCloud(
+        font_path=FONT_PATH,
+        width=width,
+        height=height,
+        max_words=len(frequencies),
+        random_state=42,
+    )
+    wc.generate_from_frequencies(dict(frequencies))
+
+    if image_format == "svg":
+        # to_svg 只嵌入用到的字形（fonttools subset），不是整個字型檔
+        return wc.to_svg(embed_font=True, optimize_embedded_font=True)
+
+    buffer = io.BytesIO()
+    if image_format == "png":
+        wc.to_image().save(buffer, format="PNG", optimize=True)
+    else:
+        wc.to_image().save(buffer, format="WEBP", quality=80, method=6)
+    return buffer.getvalue()
+
+
+def clear_word_cloud_cache() -> None:
+    _render_word_cloud.cache_clear()
+
+
+# 整個 process 共用一份 Nlp（模型只載入一次）
+_shared_nlp: Nlp | None = None
+_shared_nlp_error: BaseException | None = None
+_shared_nlp_load_seconds: float | None = None
+_shared_nlp_lock = threading.Lock()
+_warm_up_thread: threading.Thread | None = None
+
+
+def get_shared_nlp() -> Nlp:
+    """Return the process-wide Nlp, loading the models on first use (blocking)"""
+    global _shared_nlp, _shared_nlp_error, _shared_nlp_load_seconds
+
+    if _shared_nlp is not None:
+        return _shared_nlp
+
+    with _shared_nlp_lock:
+        if _shared_nlp is None:
+            started_at = time.perf_counter()
+            try:
+                _shared_nlp = Nlp(cache=default_segment_cache())
+                load_stopwords()
+            except BaseException as e:
+                _shared_nlp_error = e
+                raise
+            _shared_nlp_error = None
+            _shared_nlp_load_seconds = time.perf_counter() - started_at
+
+    return _shared_nlp
+
+
+def _warm_up():
+    try:
+        get_shared_nlp()
+    except Exception:
+        # 錯誤保留在 _shared_nlp_error，交給 load_error() 回報
+        pass
+
+
+def warm_up() -> None:
+    """Start loading the shared Nlp in a background thread (no-op if already started)"""
+    global _warm_up_thread
+
+    with _shared_nlp_lock:
+        if _shared_nlp is not None:
+            return
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return
+
+        _warm_up_thread = threading.Thread(
+            target=_warm_up, name="nlp-warm-up", daemon=True
+        )
+        _warm_up_thread.start()
+
+
+def is_ready() -> bool:
+    return _shared_nlp is not None
+
+
+def is_loading() -> bool:
+    return _warm_up_thread is not None and _warm_up_thread.is_alive()
+
+
+def load_seconds() -> float | None:
+    """Seconds spent loading the shared models, None until they are ready"""
+    return _shared_nlp_load_seconds
+
 
-        return wc.to_svg(embed_font=True)
+def load_error() -> BaseException | None:
+    return _shared_nlp_error
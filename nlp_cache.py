@@ -0,0 +1,142 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+@dataclass
+class CacheStats:
+    entries: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SegmentCache:
+    """斷詞結果的磁碟快取（SQLite），以內容雜湊為 key，超過 max_entries 時淘汰最久沒用到的項目"""
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " key TEXT PRIMARY KEY,"
+            " tokens TEXT NOT NULL,"
+            " last_used REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)"
+        )
+        (self._entries,) = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        """namespace 應涵蓋模型與停用詞版本，任一改變時舊的結果就不會再被命中"""
+        digest = hashlib.sha256(namespace.encode())
+        digest.update(b"\0")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, list[str]]:
+        keys = list(dict.fromkeys(keys))
+        found: dict[str, list[str]] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            # SQLite 預設最多 999 個參數
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, tokens FROM segments WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update((key, json.loads(tokens)) for key, tokens in rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE segments SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items: dict[str, list[str]]) -> None:
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, tokens in items.items():
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO segments (key, tokens, last_used) VALUES (?, ?, ?)",
+                        (key, json.dumps(tokens, ensure_ascii=False), now),
+                    )
+                    self._entries += cursor.rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            if self._entries > self.max_entries:
+                self._evict(self._entries - self.max_entries)
+
+    def _evict(self, count: int) -> None:
+        cursor = self._conn.execute(
+            "DELETE FROM segments WHERE key IN"
+            " (SELECT key FROM segments ORDER BY last_used LIMIT ?)",
+            (count,),
+        )
+        self._entries -= cursor.rowcount
+        self.evictions += cursor.rowcount
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                entries=self._entries,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM segments")
+            self._entries = 0
+
+
+def default_segment_cache() -> SegmentCache | None:
+    """依環境變數建立快取；NLP_CACHE_PATH 設為空字串時停用"""
+    path = os.getenv("NLP_CACHE_PATH", ".cache/nlp-segments.sqlite3")
+    if not path:
+        return None
+
+    max_entries = int(os.getenv("NLP_CACHE_MAX_ENTRIES", "100000"))
+    return SegmentCache(path, max_entries=max_entries)
@@ -1,19 +1,26 @@
-import re
+from functools import cache
+
 from bson import ObjectId
-import pandas as pd
+import plotly.express as px
 import streamlit as st
 
-from pymongo.collection import Collection
-
-from components import get_database_client, platform_options
-from models import (
-    ArticleMongoModel,
-    CommentMongoModel,
-    ReplyMongoModel,
-    comment_from_mongo_model,
-    reply_from_mongo_model,
+from components import (
+    get_nlp_or_notice,
+    get_repository,
+    page_caption,
+    pagination_controls,
+    thread_duplicates,
+    top_keywords,
+    word_counts_or_notice,
 )
+import export
+from models import comments_frame, replies_frame
 import nlp
+from pagination import cursor_state
+from platforms import platform_options
+import queries
+import thread_keywords
+import timeseries
 
 st.title("留言探勘")
 
@@ -33,17 +40,20 @@ selected_platform = st.sidebar.selectbox(
 article_id = st.sidebar.text_input("文章 ID", value=current_article_id)
 
 show_this_page_keywords = st.sidebar.checkbox("顯示這一頁的關鍵字")
+show_timeline = st.sidebar.checkbox("顯示留言時間分布")
+show_duplicates = st.sidebar.checkbox("顯示重複留言", help="內容相同或幾乎相同的留言")
+show_thread_keywords = st.sidebar.checkbox(
+    "顯示整個討論串的關鍵字", help="所有留言與回覆，留言很多時需要一些時間"
+)
 
-client = get_database_client()
-db = client[selected_platform]
-article_collection: Collection[ArticleMongoModel] = db["articles"]
-comments_collection: Collection[CommentMongoModel] = db["comments"]
+# 讀取都經過查詢快取，勾選選項或點選一列而重跑時不會再查 MongoDB
+db = get_repository().database(selected_platform)
 
 if not article_id or article_id == "":
     st.error("請輸入文章 ID！")
     st.stop()
 
-article = article_collection.find_one({"article_id": article_id})
+article = queries.find_article_by_article_id(db, article_id)
 
 if not article:
     st.error(f"找不到 ID 為 {article_id} 的文章！")
@@ -52,15 +62,8 @@ if not article:
 st.write(f"### {article['title']}")
 assert "_id" in article, "article 必須包含 _id 欄位"
 
-total_comments_count = comments_collection.count_documents(
-    {"article_id": article["_id"]}
-)
-positive_comments_count = comments_collection.count_documents(
-    {"article_id": article["_id"], "reaction_type": "+1"}
-)
-negative_comments_count = comments_collection.count_documents(
-    {"article_id": article["_id"], "reaction_type": "-1"}
-)
+comment_stats = queries.article_comment_stats(db, article["_id"])
+total_comments_count = comment_stats.total
 
 if total_comments_count == 0:
     st.warning("此篇文章沒有任何留言！")
@@ -68,60 +71,206 @@ if total_comments_count == 0:
 
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.metric(
-        label="留言數",
-        value=comments_collection.count_documents({"article_id": article["_id"]}),
-    )
+    st.metric(label="留言數", value=total_comments_count)
 with col2:
-    ratio = positive_comments_count / total_comments_count
+    ratio = comment_stats.positive / total_comments_count
     st.metric(label="推文比例", value=f"{ratio:.2%}")
 with col3:
-    ratio = negative_comments_count / total_comments_count
+    ratio = comment_stats.negative / total_comments_count
     st.metric(label="噓文比例", value=f"{ratio:.2%}")
 
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric(label="讚 / 倒讚", value=f"{comment_stats.likes} / {comment_stats.dislikes}")
+with col2:
+    assert comment_stats.first_comment_at is not None
+    st.metric(
+        label="第一則留言", value=comment_stats.first_comment_at.strftime("%Y-%m-%d %H:%M")
+    )
+with col3:
+    assert comment_stats.last_comment_at is not None
+    st.metric(
+        label="最後一則留言", value=comment_stats.last_comment_at.strftime("%Y-%m-%d %H:%M")
+    )
+if comment_stats.materialized_at is not None:
+    updated_at = comment_stats.materialized_at.strftime("%Y-%m-%d %H:%M")
+    st.caption(f"來自統計文件，更新於 {updated_at} (UTC)")
+
+with st.sidebar.expander("匯出討論串"):
+    # 產生檔案要讀完整個討論串，按下按鈕才做，結果留到換文章為止
+    export_scope = (selected_platform, article["_id"])
+    if st.button("產生 Parquet 檔", key="thread_export_prepare"):
+        with st.spinner("匯出中…"):
+            st.session_state["thread_export"] = (
+                export_scope,
+                export.thread_parquet(db.database, article["_id"]),
+            )
+
+    prepared_export = st.session_state.get("thread_export")
+    if prepared_export is not None and prepared_export[0] == export_scope:
+        for source, label in [("comments", "留言"), ("replies", "回覆")]:
+            st.download_button(
+                f"下載{label}",
+                prepared_export[1][source],
+                file_name=f"{selected_platform}_{article_id}_{source}.parquet",
+                mime="application/vnd.apache.parquet",
+                key=f"thread_export_{source}",
+            )
+
+if show_timeline:
+    with st.expander("留言時間分布", expanded=True):
+        assert comment_stats.first_comment_at is not None
+        assert comment_stats.last_comment_at is not None
+        timeline_df, bucket = timeseries.thread_volume(
+            db,
+            article["_id"],
+            comment_stats.first_comment_at,
+            comment_stats.last_comment_at,
+        )
+        st.plotly_chart(
+            px.bar(
+                timeline_df,
+                x="time",
+                y=["comments", "replies"],
+                labels={"time": "時間", "value": "數量", "variable": ""},
+            ),
+            use_container_width=True,
+        )
+        st.plotly_chart(
+            px.line(
+                timeline_df,
+                x="time",
+                y=["push_ratio", "boo_ratio"],
+                labels={"time": "時間", "value": "比例", "variable": ""},
+            ).update_yaxes(tickformat=".0%"),
+            use_container_width=True,
+        )
+        st.caption(f"{bucket.label}一個區間，共 {len(timeline_df)} 個區間")
+
+if show_duplicates:
+    with st.expander("重複留言", expanded=True):
+        with st.spinner("比對留言中…"):
+            duplicates = thread_duplicates(
+                selected_platform, str(article["_id"]), total_comments_count
+            )
+        if not duplicates:
+            st.info("沒有重複的留言")
+        else:
+            duplicated_count = sum(summary.count for summary in duplicates)
+            st.caption(
+                f"{duplicated_count} 則留言屬於 {len(duplicates)} 組重複的內容，"
+                f"佔全部留言的 {duplicated_count / total_comments_count:.0%}；"
+                "關鍵字與文字雲的斷詞每組只做一次"
+            )
+            st.dataframe(
+                [
+                    {
+                        "則數": summary.count,
+                        "留言": summary.text,
+                        "其他寫法": " / ".join(summary.variants),
+                    }
+                    for summary in duplicates
+                ],
+                hide_index=True,
+            )
+
 # Pagination controls
 items_per_page = st.sidebar.selectbox("每頁顯示筆數", [10, 20, 50, 100], index=0)
-total_pages = (total_comments_count + items_per_page - 1) // items_per_page
-current_page = st.sidebar.number_input(
-    "頁數", min_value=1, max_value=total_pages, value=1, step=1
+page_state = cursor_state(
+    st.session_state,
+    "comments_mining_page",
+    scope=(selected_platform, article_id, items_per_page),
 )
 
-# Calculate skip value for pagination
-skip = (current_page - 1) * items_per_page
-
-comments = (
-    comments_collection.find({"article_id": article["_id"]})
-    .sort("created_at", 1)  # 由舊到新排序
-    .skip(skip)
-    .limit(items_per_page)
+comments_page = queries.list_comments(
+    db, article["_id"], items_per_page, after=page_state.after, before=page_state.before
 )
-comments_df = pd.DataFrame([comment_from_mongo_model(comment) for comment in comments])
+if not comments_page.has_previous:
+    page_state.page_number = 1
+
+comments_df = comments_frame(comments_page.documents, queries.COMMENT_TABLE_FIELDS)
+
+# 這一頁所有留言的回覆一次讀完，點選留言時不用再查詢
+page_comment_ids = [comment["_id"] for comment in comments_page.documents]
+replies_by_comment = queries.replies_by_comment(db, article["_id"], page_comment_ids)
+comments_df["replies"] = [
+    len(replies_by_comment[comment_id]) for comment_id in page_comment_ids
+]
+
+pagination_controls(page_state, comments_page, "comments_mining", direction=1)
 
 comments_display_df = comments_df[
-    ["reaction_type", "content", "author", "likes", "dislikes", "created_at"]
+    [
+        "reaction_type",
+        "content",
+        "author",
+        "likes",
+        "dislikes",
+        "replies",
+        "created_at",
+    ]
 ]
 
 comments_display_df_state = st.dataframe(
     comments_display_df, selection_mode="single-row", on_select="rerun"
 )
-st.caption(
-    f"顯示第 {skip + 1} 至 {min(skip + items_per_page, total_comments_count)} 筆，共 {total_comments_count} 筆"
-)
+st.caption(page_caption(page_state, comments_page, total_comments_count))
 
 if show_this_page_keywords:
     with st.expander("這一頁留言的關鍵字"):
-        nlp_instance = nlp.Nlp()
-
-        # 將所有留言彙整成一個很大的字串
-        all_comments_content = " ".join(comments_df["content"].tolist())
-        word_counts = nlp_instance.word_count(all_comments_content)
+        word_counts = word_counts_or_notice(
+            db,
+            "comments",
+            [ObjectId(_id) for _id in comments_df["_id"]],
+            comments_df["content"].tolist(),
+            key="comments_keywords",
+        )
+        if word_counts is not None:
+            keywords = top_keywords(selected_platform, "comments", word_counts)
+            st.write("關鍵字: ", "、".join(keywords))
 
-        keywords = nlp_instance.keywords(word_counts)
-        st.write("關鍵字: ", "、".join(keywords))
+            word_cloud = nlp.word_cloud(word_counts)
 
-        word_cloud = nlp_instance.word_cloud(word_counts)
+            st.image(word_cloud)
 
-        st.image(word_cloud)
+if show_thread_keywords:
+    with st.expander("整個討論串的關鍵字", expanded=True):
+        thread_total = thread_keywords.count_thread_documents(db, article["_id"])
+        thread_counts = thread_keywords.cached_counts(
+            db.name, article["_id"], thread_total
+        )
+        if thread_counts is None:
+            progress_bar = st.progress(0.0)
+            partial_keywords = st.empty()
+            # 一批一批讀取與斷詞，邊算邊顯示目前的結果；
+            # 斷詞模型還沒載入完成時顯示提示並停止，不阻塞頁面
+            for progress in thread_keywords.mine_thread(
+                db.database,
+                article["_id"],
+                thread_total,
+                # 提示與斷詞快取的統計只顯示一次
+                get_nlp=cache(lambda: get_nlp_or_notice("thread_keywords")),
+            ):
+                progress_bar.progress(
+                    progress.processed / progress.total,
+                    text=f"已分析 {progress.processed} / {progress.total} 則",
+                )
+                partial_keywords.write(
+                    "目前的關鍵字: " + "、".join(
+                        top_keywords(selected_platform, "comments", progress.counts)
+                    )
+                )
+            progress_bar.empty()
+            partial_keywords.empty()
+            # 中途停止的結果不完整，不顯示
+            thread_counts = thread_keywords.cached_counts(
+                db.name, article["_id"], thread_total
+            )
+
+        if thread_counts:
+            keywords = top_keywords(selected_platform, "comments", thread_counts)
+            st.write("關鍵字: ", "、".join(keywords))
+            st.image(nlp.word_cloud(thread_counts))
 
 comment_selection = comments_display_df_state.get("selection")
 if (
@@ -134,18 +283,13 @@ if (
     st.subheader("這則留言底下的回覆")
 
     comment_serial = comment_selection["rows"][0]
-    comment = comments_df.iloc[comment_serial]
-
-    replies_collection: Collection[ReplyMongoModel] = db["replies"]
-    replies = replies_collection.find(
-        {"article_id": article["_id"], "comment_id": ObjectId(comment["_id"])}
-    ).sort("created_at", 1).to_list()
+    replies = replies_by_comment[page_comment_ids[comment_serial]]
 
     if len(replies) == 0:
         st.warning("這則留言底下沒有任何回覆！")
         st.stop()
 
-    replies_df = pd.DataFrame([reply_from_mongo_model(reply) for reply in replies])
+    replies_df = replies_frame(replies, queries.REPLY_TABLE_FIELDS)
 
     replies_display_df = replies_df[
         ["reaction_type", "content", "author", "likes", "dislikes", "created_at"]
@@ -156,18 +300,21 @@ if (
     show_replies_keywords = st.sidebar.checkbox("顯示回覆的關鍵字")
     if show_replies_keywords:
         with st.expander("回覆的關鍵字"):
-            nlp_instance = nlp.Nlp()
-
-            all_replies_content = " ".join(replies_df["content"].tolist())
-
-            # 刪除「樓層」(B1, B1-2)
-            all_replies_content = re.sub(r"B\d+(?:-\d+)?", "", all_replies_content)
-
-            word_counts = nlp_instance.word_count(all_replies_content)
-
-            keywords = nlp_instance.keywords(word_counts)
-            st.write("關鍵字: ", "、".join(keywords))
-
-            word_cloud = nlp_instance.word_cloud(word_counts)
-
-            st.image(word_cloud)
+            word_counts = word_counts_or_notice(
+                db,
+                "replies",
+                [ObjectId(_id) for _id in replies_df["_id"]],
+                replies_df["content"].tolist(),
+                key="replies_keywords",
+                # 刪除「樓層」(B1, B1-2)
+                preprocess=lambda nlp_instance, content: (
+                    nlp_instance.cleaner.remove_floor_numbers(content)
+                ),
+            )
+            if word_counts is not None:
+                keywords = top_keywords(selected_platform, "replies", word_counts)
+                st.write("關鍵字: ", "、".join(keywords))
+
+                word_cloud = nlp.word_cloud(word_counts)
+
+                st.image(word_cloud)
@@ -1,46 +1,106 @@
 from typing import Any
 from bson import ObjectId
-import pandas as pd
 import streamlit as st
 import nlp
 
-from pymongo.collection import Collection
-
-from components import get_database_client, platform_options
-from models import ArticleMongoModel, CommentMongoModel, article_from_mongo_model
+from components import (
+    get_repository,
+    page_caption,
+    pagination_controls,
+    top_keywords,
+    word_counts_or_notice,
+)
+from models import articles_frame
+from pagination import Page, cursor_state
+from platforms import platform_options
+import queries
+import search_index
 
 st.title("MongoDB 資料總覽")
 
 selected_platform = st.sidebar.selectbox("選擇平台", platform_options())
 st.session_state["selected_platform"] = selected_platform
 
-client = get_database_client()
-db = client[selected_platform]
-articles: Collection[ArticleMongoModel] = db["articles"]
+# 讀取都經過查詢快取，勾選選項或點選一列而重跑時不會再查 MongoDB
+db = get_repository().database(selected_platform)
 
 # Pagination controls
-search_query = st.sidebar.text_input("搜尋關鍵字…")
+search_text = st.sidebar.text_input("搜尋關鍵字…")
+
+# 有搜尋索引時走索引；沒有的話退回（跳脫過的）正規表示式
+search: dict[str, Any] | None = None
+include_content = False
+rank_by_relevance = False
+if search_text:
+    search_status = queries.search_status(db.database)
+    if search_status.ready:
+        if search_status.include_content:
+            include_content = st.sidebar.checkbox("同時搜尋內文")
+        search = search_index.search_query(search_text, include_content)
+        rank_by_relevance = search is not None and st.sidebar.checkbox(
+            "依相關度排序", help="只顯示最相關的一頁"
+        )
+    elif search_status.outdated:
+        updated_at = (
+            f"更新於 {search_status.updated_at.strftime('%Y-%m-%d %H:%M')} (UTC)，"
+            if search_status.updated_at is not None
+            else ""
+        )
+        st.sidebar.caption(
+            f"搜尋索引{updated_at}還沒有最新的文章，搜尋會比較慢"
+            "（執行 search_index.py --watch 持續更新）"
+        )
+    else:
+        st.sidebar.caption("尚未建立搜尋索引，搜尋會比較慢（執行 search_index.py 建立）")
+
 query: dict[str, Any] = {}
-if search_query:
-    query["title"] = {"$regex": search_query, "$options": "i"}
+if search_text and search is None:
+    query = queries.title_regex_query(search_text)
 
-total_articles = articles.count_documents(query)
+if search is not None:
+    total_articles = queries.count_search_results(db, search)
+else:
+    total_articles = queries.count_articles(db, query)
 
 items_per_page = st.sidebar.selectbox("每頁顯示筆數", [10, 20, 50, 100], index=0)
-total_pages = (total_articles + items_per_page - 1) // items_per_page
-current_page = st.sidebar.number_input(
-    "頁數", min_value=1, max_value=total_pages, value=1, step=1
+page_state = cursor_state(
+    st.session_state,
+    "content_list_page",
+    scope=(
+        selected_platform,
+        search_text,
+        include_content,
+        rank_by_relevance,
+        items_per_page,
+    ),
 )
 
-# Calculate skip value for pagination
-skip = (current_page - 1) * items_per_page
+# 列表不讀取文章內文
+if rank_by_relevance:
+    found_articles_page = Page(
+        documents=queries.ranked_search(  # type: ignore[arg-type]
+            db, search_text, items_per_page, include_content
+        ),
+        has_previous=False,
+        has_next=False,
+    )
+elif search is not None:
+    found_articles_page = queries.search_articles(
+        db, search, items_per_page, after=page_state.after, before=page_state.before
+    )
+else:
+    found_articles_page = queries.list_articles(
+        db, query, items_per_page, after=page_state.after, before=page_state.before
+    )
+if not found_articles_page.has_previous:
+    page_state.page_number = 1
 
-found_articles_db = articles.find(query).sort("created_at", -1).skip(skip).limit(items_per_page).to_list()
-found_articles_df = pd.DataFrame(
-    [article_from_mongo_model(article) for article in found_articles_db]
+found_articles_df = articles_frame(
+    found_articles_page.documents, queries.ARTICLE_LIST_FIELDS
 )
 found_articles_df.set_index("_id", inplace=True)
-found_articles_df = found_articles_df[["title", "created_at", "article_id"]]
+
+pagination_controls(page_state, found_articles_page, "content_list", direction=-1)
 
 with st.expander("文章列表", expanded=True):
     # Display paginated results
@@ -52,9 +112,13 @@ with st.expander("文章列表", expanded=True):
     )
 
     # Display pagination info
-    st.caption(
-        f"顯示第 {skip + 1} 至 {min(skip + items_per_page, total_articles)} 筆，共 {total_articles} 筆"
-    )
+    if rank_by_relevance:
+        st.caption(
+            f"依相關度顯示前 {len(found_articles_page.documents)} 筆，"
+            f"共 {total_articles} 筆符合"
+        )
+    else:
+        st.caption(page_caption(page_state, found_articles_page, total_articles))
 
 selection = df_state.get("selection")
 if selection and "rows" in selection and len(selection["rows"]) > 0:
@@ -63,17 +127,13 @@ if selection and "rows" in selection and len(selection["rows"]) > 0:
 
     st.session_state["article_id"] = found_articles_df.loc[article_id]["article_id"]
 
-    article = articles.find_one({"_id": ObjectId(article_id)})
+    article = queries.get_article(db, ObjectId(article_id))
     if article is None:
         st.error("找不到文章")
         st.stop()
 
-    comments_collection: Collection[CommentMongoModel] = db["comments"]
-
     assert "_id" in article
-    total_count_comments = comments_collection.count_documents(
-        {"article_id": article["_id"]}
-    )
+    total_count_comments = queries.count_comments(db, article["_id"])
 
     st.write(f"## {article['title']}")
 
@@ -101,11 +161,16 @@ if selection and "rows" in selection and len(selection["rows"]) > 0:
 
     if show_word_cloud:
         with st.expander("文字雲", expanded=False):
-            nlp_instance = nlp.Nlp()
-            word_counts = nlp_instance.word_count(article["content"])
-
-            keywords = nlp_instance.keywords(word_counts)
-            st.write("關鍵字: ", "、".join(keywords))
-
-            word_cloud = nlp_instance.word_cloud(word_counts)
-            st.image(word_cloud)
+            word_counts = word_counts_or_notice(
+                db,
+                "articles",
+                [article["_id"]],
+                [article["content"]],
+                key="article_word_cloud",
+            )
+            if word_counts is not None:
+                keywords = top_keywords(selected_platform, "articles", word_counts)
+                st.write("關鍵字: ", "、".join(keywords))
+
+                word_cloud = nlp.word_cloud(word_counts)
+                st.image(word_cloud)
@@ -1,28 +1,43 @@
+import pandas as pd
+import plotly.express as px
 import streamlit as st
 
-from components import get_database_client, platform_options
+from components import get_repository
+from platforms import platform_options
+import queries
+import timeseries
 
 st.title("資料庫總覽")
 
-database_client = get_database_client()
+use_estimated_counts = st.sidebar.checkbox(
+    "使用估計筆數（較快）",
+    value=True,
+    help="用 collection 的 metadata 估計文件數，不逐筆計算；已用 platform_stats.py 建立統計文件的平台不受影響",
+)
+show_volume = st.sidebar.checkbox("顯示數量變化")
 
-for platform_index, platform in enumerate(platform_options()):
-    if platform_index > 0:
-        st.divider()
+repository = get_repository()
+if st.sidebar.button("重新整理統計"):
+    repository.invalidate()
 
-    st.subheader(platform)
+overviews = queries.platform_overviews(
+    repository, platform_options(), use_estimated_counts
+)
 
-    db = database_client[platform]
+for platform_index, overview in enumerate(overviews):
+    if platform_index > 0:
+        st.divider()
 
-    article_collection = db["articles"]
-    comment_collection = db["comments"]
-    reply_collection = db["replies"]
+    st.subheader(overview.platform)
+    if overview.materialized_at is not None:
+        updated_at = overview.materialized_at.strftime("%Y-%m-%d %H:%M")
+        st.caption(f"來自統計文件，更新於 {updated_at} (UTC)")
 
     col1, col2, col3 = st.columns(3)
 
-    total_articles = article_collection.count_documents({})
-    total_comments = comment_collection.count_documents({})
-    total_replies = reply_collection.count_documents({})
+    total_articles = overview.articles
+    total_comments = overview.comments
+    total_replies = overview.replies
 
     with col1:
         st.metric(label="文章數", value=total_articles)
@@ -36,13 +51,11 @@ for platform_index, platform in enumerate(platform_options()):
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        oldest_article = article_collection.find_one(sort=[("created_at", 1)])
-        assert oldest_article is not None, "找不到文章"
-        oldest_date = oldest_article["created_at"]
+        assert overview.oldest_article_at is not None, "找不到文章"
+        oldest_date = overview.oldest_article_at
 
-        newest_article = article_collection.find_one(sort=[("created_at", -1)])
-        assert newest_article is not None, "找不到文章"
-        newest_date = newest_article["created_at"]
+        assert overview.newest_article_at is not None, "找不到文章"
+        newest_date = overview.newest_article_at
 
         st.metric(
             label="時間跨度",
@@ -53,3 +66,79 @@ for platform_index, platform in enumerate(platform_options()):
     with col2:
         st.metric(label="留言 / 文章比", value=f"{total_comments / total_articles:.2%}")
         st.metric(label="回覆 / 留言比", value=f"{total_replies / total_comments:.2%}")
+
+st.caption(
+    f"統計結果快取 {queries.OVERVIEW_CACHE_TTL_SECONDS} 秒"
+    + ("，文件數為估計值" if use_estimated_counts else "")
+)
+
+if show_volume:
+    st.divider()
+    st.subheader("數量變化")
+
+    volume_labels = {"articles": "文章數", "comments": "留言數", "replies": "回覆數"}
+    volume_source = st.radio(
+        "數量",
+        list(volume_labels),
+        format_func=volume_labels.__getitem__,
+        horizontal=True,
+        label_visibility="collapsed",
+    )
+
+    volumes = []
+    without_daily = []
+    for overview in overviews:
+        if overview.oldest_article_at is None or overview.newest_article_at is None:
+            continue
+        if overview.daily is not None:
+            # platform_stats.py 已經彙整好每天的數量，不必查詢 collection
+            volume, bucket = timeseries.daily_volume(
+                overview.daily,
+                volume_source,
+                overview.oldest_article_at,
+                overview.newest_article_at,
+            )
+        elif volume_source == "articles":
+            volume, bucket = timeseries.article_volume(
+                repository.database(
+                    overview.platform, queries.OVERVIEW_CACHE_TTL_SECONDS
+                ),
+                overview.oldest_article_at,
+                overview.newest_article_at,
+            )
+        else:
+            # 即時彙整所有留言或回覆太慢，只用統計文件
+            without_daily.append(overview.platform)
+            continue
+        volumes.append(volume.assign(platform=overview.platform, bucket=bucket.label))
+
+    if volumes:
+        volume_df = pd.concat(volumes, ignore_index=True)
+        st.plotly_chart(
+            px.line(
+                volume_df,
+                x="time",
+                y=volume_source,
+                color="platform",
+                hover_data=["bucket"],
+                labels={
+                    "time": "時間",
+                    volume_source: volume_labels[volume_source],
+                    "platform": "平台",
+                },
+            ),
+            use_container_width=True,
+        )
+        st.caption(
+            "、".join(
+                f"{platform}：{bucket}"
+                for platform, bucket in volume_df.groupby("platform")["bucket"]
+                .first()
+                .items()
+            )
+        )
+    if without_daily:
+        st.caption(
+            f"{'、'.join(without_daily)} 沒有統計文件，"
+            f"無法顯示{volume_labels[volume_source]}（執行 platform_stats.py 建立）"
+        )
@@ -0,0 +1,145 @@
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Literal
+
+from bson import ObjectId
+from pymongo.collection import Collection
+
+# 以 (created_at, _id) 做 keyset 分頁：每一頁都從上一頁的最後一筆接著查，
+# MongoDB 不用像 skip() 一樣先走過並丟掉前面所有的文件，翻到多深都一樣快。
+
+SortDirection = Literal[1, -1]
+
+
+@dataclass(frozen=True)
+class PageToken:
+    """Position in the (created_at, _id) order; _id=None marks a date boundary (inclusive)"""
+
+    created_at: datetime
+    _id: ObjectId | None = None
+
+
+@dataclass
+class Page:
+    documents: list[dict[str, Any]]
+    has_previous: bool
+    has_next: bool
+
+    @property
+    def first_token(self) -> PageToken | None:
+        if not self.documents:
+            return None
+        return PageToken(self.documents[0]["created_at"], self.documents[0]["_id"])
+
+    @property
+    def last_token(self) -> PageToken | None:
+        if not self.documents:
+            return None
+        return PageToken(self.documents[-1]["created_at"], self.documents[-1]["_id"])
+
+
+def _comparison(direction: SortDirection, forward: bool) -> str:
+    return "$gt" if (direction == 1) == forward else "$lt"
+
+
+def keyset_filter(
+    token: PageToken, direction: SortDirection, forward: bool
+) -> dict[str, Any]:
+    """Match documents strictly after (forward) or before the token in the given sort order"""
+    op = _comparison(direction, forward)
+
+    if token._id is None:
+        # 日期邊界本身要包含在往後的那一側
+        inclusive_op = op + "e" if forward else op
+        return {"created_at": {inclusive_op: token.created_at}}
+
+    return {
+        "$or": [
+            {"created_at": {op: token.created_at}},
+            {"created_at": token.created_at, "_id": {op: token._id}},
+        ]
+    }
+
+
+def _and(query: dict[str, Any], extra: dict[str, Any]) -> dict[str, Any]:
+    if not query:
+        return extra
+    return {"$and": [query, extra]}
+
+
+def fetch_page(
+    collection: Collection,
+    query: dict[str, Any],
+    direction: SortDirection,
+    limit: int,
+    projection: dict[str, int] | None = None,
+    after: PageToken | None = None,
+    before: PageToken | None = None,
+) -> Page:
+    """Fetch the page right after `after`, right before `before`, or the first page"""
+    if projection is not None:
+        # keyset 需要這兩個欄位當下一頁的起點
+        projection = {**projection, "created_at": 1, "_id": 1}
+
+    if before is not None:
+        reverse: SortDirection = -direction  # type: ignore[assignment]
+        documents = (
+            collection.find(
+                _and(query, keyset_filter(before, direction, forward=False)), projection
+            )
+            .sort([("created_at", reverse), ("_id", reverse)])
+            .limit(limit + 1)
+            .to_list()
+        )
+        has_previous = len(documents) > limit
+        documents = documents[:limit]
+        documents.reverse()
+        return Page(documents=documents, has_previous=has_previous, has_next=True)
+
+    filtered_query = query
+    if after is not None:
+        filtered_query = _and(query, keyset_filter(after, direction, forward=True))
+
+    documents = (
+        collection.find(filtered_query, projection)
+        .sort([("created_at", direction), ("_id", direction)])
+        .limit(limit + 1)
+        .to_list()
+    )
+    has_next = len(documents) > limit
+    documents = documents[:limit]
+
+    has_previous = False
+    if after is not None:
+        if after._id is not None:
+            has_previous = True
+        elif documents:
+            # 跳到某個日期時，確認前面是否還有資料
+            first = PageToken(documents[0]["created_at"], documents[0]["_id"])
+            previous_query = _and(query, keyset_filter(first, direction, forward=False))
+            has_previous = collection.find_one(previous_query, {"_id": 1}) is not None
+
+    return Page(documents=documents, has_previous=has_previous, has_next=has_next)
+
+
+@dataclass
+class CursorState:
+    """目前這一頁的位置，存在 st.session_state 裡"""
+
+    scope: Any = None
+    after: PageToken | None = None
+    before: PageToken | None = None
+    # 跳到某個日期之後就不知道是第幾頁
+    page_number: int | None = 1
+
+
+def cursor_state(
+    session_state: MutableMapping[str, Any], key: str, scope: Any
+) -> CursorState:
+    """Return the pagination state stored under key, starting over when scope changes"""
+    state = session_state.get(key)
+    if not isinstance(state, CursorState) or state.scope != scope:
+        state = CursorState(scope=scope)
+        session_state[key] = state
+    return state
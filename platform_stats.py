@@ -0,0 +1,326 @@
+"""維護每個平台的統計文件，讓總覽與留言探勘頁面只讀一筆小文件，不必掃描整個 collection。
+
+    uv run python platform_stats.py                 # 所有平台，處理上次之後新增的文件
+    uv run python platform_stats.py --watch         # 追上進度後持續更新（有 replica set 時用 change stream）
+    uv run python platform_stats.py --rebuild       # 清掉統計重新計算（例如刪除過資料之後）
+
+platform_stats 的 "summary" 文件記錄文章、留言、回覆數、最早與最新的文章時間，以及每日的數量
+（總覽頁的數量變化圖直接使用）；
+article_stats 每篇文章一筆，記錄留言數、推噓數、讚數與第一則、最後一則留言的時間。
+只追蹤新增的文件，刪除或修改不會反映在統計裡，需要時用 --rebuild 重算。
+"""
+
+import argparse
+from datetime import datetime, timezone
+import os
+import time
+from typing import Any
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from mongo_config import create_client
+from platforms import platform_options
+
+STATS_COLLECTION = "platform_stats"
+ARTICLE_STATS_COLLECTION = "article_stats"
+SUMMARY_ID = "summary"
+
+SOURCES = ["articles", "comments", "replies"]
+
+# 一次最多處理的新文件數，避免第一次建立時單一 aggregation 太大
+WINDOW_SIZE = 100_000
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def get_summary(db: Database) -> dict[str, Any] | None:
+    return db[STATS_COLLECTION].find_one({"_id": SUMMARY_ID})
+
+
+def get_article_stats(db: Database, article_id: Any) -> dict[str, Any] | None:
+    return db[ARTICLE_STATS_COLLECTION].find_one({"_id": article_id})
+
+
+def _window_upper_bound(db: Database, source: str, last_id: Any) -> Any | None:
+    """_id of the last document in the next window, None when there is nothing new"""
+    query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+    document = (
+        db[source]
+        .find(query, {"_id": 1})
+        .sort("_id", 1)
+        .skip(WINDOW_SIZE - 1)
+        .limit(1)
+        .to_list()
+    )
+    if document:
+        return document[0]["_id"]
+
+    # 剩下的不足一個 window，取最後一筆
+    last = db[source].find_one(query, {"_id": 1}, sort=[("_id", -1)])
+    return last["_id"] if last is not None else None
+
+
+def _window_match(last_id: Any, upper_id: Any) -> dict[str, Any]:
+    id_range: dict[str, Any] = {"$lte": upper_id}
+    if last_id is not None:
+        id_range["$gt"] = last_id
+    return {"$match": {"_id": id_range}}
+
+
+def _article_stats_group(group_id: Any) -> dict[str, Any]:
+    return {
+        "$group": {
+            "_id": group_id,
+            "total": {"$sum": 1},
+            "positive": {"$sum": {"$cond": [{"$eq": ["$reaction_type", "+1"]}, 1, 0]}},
+            "negative": {"$sum": {"$cond": [{"$eq": ["$reaction_type", "-1"]}, 1, 0]}},
+            "likes": {"$sum": {"$ifNull": ["$likes", 0]}},
+            "dislikes": {"$sum": {"$ifNull": ["$dislikes", 0]}},
+            "first_comment_at": {"$min": "$created_at"},
+            "last_comment_at": {"$max": "$created_at"},
+        }
+    }
+
+
+_ARTICLE_COUNTS = ("total", "positive", "negative", "likes", "dislikes")
+
+
+def _recount_article(db: Database, article_id: Any, upper_id: Any) -> None:
+    """Replace one article's stats with a full count of its comments up to upper_id"""
+    counted = (
+        db["comments"]
+        .aggregate(
+            [
+                {"$match": {"article_id": article_id, "_id": {"$lte": upper_id}}},
+                _article_stats_group(None),
+            ]
+        )
+        .to_list()
+    )
+    if not counted:
+        return
+
+    # 只往前推進：另一個 process 已經數到更後面時保留它的結果
+    stats = {field: counted[0][field] for field in _ARTICLE_COUNTS}
+    db[ARTICLE_STATS_COLLECTION].update_one(
+        {"_id": article_id, "watermark": {"$lt": upper_id}},
+        {
+            "$set": {
+                **stats,
+                "first_comment_at": counted[0]["first_comment_at"],
+                "last_comment_at": counted[0]["last_comment_at"],
+                "watermark": upper_id,
+                "updated_at": datetime.now(timezone.utc),
+            }
+        },
+    )
+
+
+def _update_article_stats(db: Database, last_id: Any, upper_id: Any) -> None:
+    groups = (
+        db["comments"]
+        .aggregate(
+            [_window_match(last_id, upper_id), _article_stats_group("$article_id")]
+        )
+        .to_list()
+    )
+
+    # 每篇文章的統計各自記錄已經數到哪個 _id。只有還停在 window 起點之前的才能直接累加；
+    # 條件不成立而 upsert 撞到既有的 _id，表示這個 window 有一部分已經加過
+    # （上次在更新 summary 前中斷，或另一個 process 同時在跑），這些文章改成整篇重數
+    now = datetime.now(timezone.utc)
+    not_applied: dict[str, Any] = {"watermark": {"$exists": False}}
+    guard = (
+        {"$or": [{"watermark": {"$lte": last_id}}, not_applied]}
+        if last_id is not None
+        else not_applied
+    )
+    operations = [
+        UpdateOne(
+            {"_id": group["_id"], **guard},
+            {
+                "$inc": {field: group[field] for field in _ARTICLE_COUNTS},
+                "$min": {"first_comment_at": group["first_comment_at"]},
+                "$max": {"last_comment_at": group["last_comment_at"]},
+                "$set": {"watermark": upper_id, "updated_at": now},
+            },
+            upsert=True,
+        )
+        for group in groups
+    ]
+    if not operations:
+        return
+
+    try:
+        db[ARTICLE_STATS_COLLECTION].bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        write_errors = e.details["writeErrors"]
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in write_errors):
+            raise
+        for error in write_errors:
+            _recount_article(db, groups[error["index"]]["_id"], upper_id)
+
+
+def _update_summary(
+    db: Database, source: str, last_id: Any, upper_id: Any
+) -> int | None:
+    """Add the window to the summary; None when another run already moved the watermark"""
+    grouped = db[source].aggregate(
+        [
+            _window_match(last_id, upper_id),
+            {
+                "$group": {
+                    "_id": {
+                        "$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}
+                    },
+                    "count": {"$sum": 1},
+                    "oldest": {"$min": "$created_at"},
+                    "newest": {"$max": "$created_at"},
+                }
+            },
+        ]
+    ).to_list()
+
+    added = sum(group["count"] for group in grouped)
+    increments = {source: added}
+    for group in grouped:
+        if group["_id"] is not None:
+            increments[f"daily.{group['_id']}.{source}"] = group["count"]
+
+    update: dict[str, Any] = {
+        "$inc": increments,
+        "$set": {
+            f"watermarks.{source}": upper_id,
+            "updated_at": datetime.now(timezone.utc),
+        },
+    }
+    if source == "articles":
+        oldest = [group["oldest"] for group in grouped if group["oldest"] is not None]
+        newest = [group["newest"] for group in grouped if group["newest"] is not None]
+        if oldest:
+            update["$min"] = {"oldest_article_at": min(oldest)}
+        if newest:
+            update["$max"] = {"newest_article_at": max(newest)}
+
+    # 計數與進度寫在同一筆文件、同一次更新裡；條件是進度還停在 last_id，
+    # 中斷後重跑不會重複累加
+    result = db[STATS_COLLECTION].update_one(
+        {"_id": SUMMARY_ID, f"watermarks.{source}": last_id}, update
+    )
+    return added if result.modified_count == 1 else None
+
+
+def update_platform(db: Database) -> dict[str, int]:
+    """Fold every document added since the last run into the stats; returns added counts"""
+    db[STATS_COLLECTION].update_one(
+        {"_id": SUMMARY_ID},
+        {
+            "$setOnInsert": {
+                **{source: 0 for source in SOURCES},
+                "watermarks": {source: None for source in SOURCES},
+            }
+        },
+        upsert=True,
+    )
+
+    added = {source: 0 for source in SOURCES}
+    for source in SOURCES:
+        while True:
+            summary = get_summary(db)
+            assert summary is not None
+            last_id = summary["watermarks"].get(source)
+
+            upper_id = _window_upper_bound(db, source, last_id)
+            if upper_id is None:
+                break
+
+            if source == "comments":
+                _update_article_stats(db, last_id, upper_id)
+
+            # 回傳 None 表示另一個 process 同時在更新，重新讀取進度即可
+            window_added = _update_summary(db, source, last_id, upper_id)
+            if window_added is not None:
+                added[source] += window_added
+
+    return added
+
+
+def rebuild_platform(db: Database) -> None:
+    db[STATS_COLLECTION].delete_one({"_id": SUMMARY_ID})
+    db[ARTICLE_STATS_COLLECTION].delete_many({})
+
+
+def watch(client: MongoClient, platforms: list[str], interval: float) -> None:
+    """Keep the stats up to date: react to change streams, or poll without a replica set"""
+    for platform in platforms:
+        update_platform(client[platform])
+
+    try:
+        with client.watch(
+            [
+                {
+                    "$match": {
+                        "operationType": "insert",
+                        "ns.db": {"$in": platforms},
+                        "ns.coll": {"$in": SOURCES},
+                    }
+                }
+            ]
+        ) as stream:
+            print("使用 change stream 監看新增的文件")
+            while stream.alive:
+                changed: set[str] = set()
+                # 把短時間內的多筆新增合併成一次更新
+                while (change := stream.try_next()) is not None:
+                    changed.add(change["ns"]["db"])
+                for platform in changed:
+                    print(platform, update_platform(client[platform]))
+                if not changed:
+                    time.sleep(interval)
+    except OperationFailure as e:
+        # standalone mongod 不支援 change stream
+        reason = (e.details or {}).get("errmsg", e)
+        print(f"無法使用 change stream（{reason}），改為每 {interval} 秒檢查一次")
+        while True:
+            for platform in platforms:
+                added = update_platform(client[platform])
+                if any(added.values()):
+                    print(platform, added)
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="更新各平台的統計文件")
+    parser.add_argument(
+        "--platform",
+        action="append",
+        choices=platform_options(),
+        help="要處理的平台，可重複指定（預設全部）",
+    )
+    parser.add_argument("--rebuild", action="store_true", help="清掉既有統計後重算")
+    parser.add_argument("--watch", action="store_true", help="追上進度後持續更新")
+    parser.add_argument("--interval", type=float, default=5.0, help="輪詢間隔秒數")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    client = create_client(args.mongo_uri)
+    platforms = args.platform or platform_options()
+
+    for platform in platforms:
+        db = client[platform]
+        if args.rebuild:
+            rebuild_platform(db)
+
+        started_at = time.perf_counter()
+        added = update_platform(db)
+        elapsed = time.perf_counter() - started_at
+        print(f"{platform}: 新增 {added}，耗時 {elapsed:.1f} 秒")
+
+    if args.watch:
+        watch(client, platforms, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""爬蟲資料的平台；每個平台是一個 MongoDB 資料庫。
+
+頁面與命令列工具都從這裡取得平台清單，命令列工具不必 import streamlit 與畫面元件。
+"""
+
+
+def platform_options() -> list[str]:
+    return ["dcard", "ptt", "yahoo"]
@@ -0,0 +1,177 @@
+"""啟動與重跑的效能分析。
+
+    uv run python profiling.py                          # 各模組在全新 process 裡 import 的耗時
+    uv run python profiling.py --module components      # 只看一個模組，列出最慢的套件
+    APP_PROFILE=1 uv run streamlit run streamlit_app.py # 側邊欄顯示每頁的渲染時間與載入的模組
+
+import 的耗時用 python -X importtime 量，每個模組各開一個新的 process，結果就是冷啟動的成本。
+APP_PROFILE=1 時記錄每一頁第一次與最近一次渲染的時間，以及渲染中第一次 import 的模組。
+"""
+
+import argparse
+import builtins
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+
+ENABLED = os.getenv("APP_PROFILE") == "1"
+
+# 頁面用到的模組；import 它們不應該把深度學習套件一起帶進來
+APP_MODULES = [
+    "cleaner",
+    "models",
+    "pagination",
+    "query_cache",
+    "queries",
+    "components",
+    "nlp",
+]
+HEAVY_MODULES = ["hanlp", "torch", "wordcloud", "matplotlib"]
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    seconds: float
+
+
+class ImportRecorder:
+    """Record the modules imported for the first time (inclusive seconds) while active"""
+
+    def __init__(self):
+        self.records: list[ImportRecord] = []
+        self._thread_id = threading.get_ident()
+        self._depth = 0
+        self._original_import: Any = None
+
+    def _import(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        # 只記錄這個執行緒最外層、第一次的 import；巢狀 import 的時間算在外層裡
+        if (
+            threading.get_ident() != self._thread_id
+            or self._depth > 0
+            or name in sys.modules
+        ):
+            return self._original_import(name, *args, **kwargs)
+
+        self._depth += 1
+        started_at = time.perf_counter()
+        try:
+            return self._original_import(name, *args, **kwargs)
+        finally:
+            self._depth -= 1
+            self.records.append(ImportRecord(name, time.perf_counter() - started_at))
+
+    def __enter__(self) -> "ImportRecorder":
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        builtins.__import__ = self._original_import
+
+
+@dataclass
+class RenderProfile:
+    page: str
+    runs: int = 0
+    first_seconds: float | None = None
+    first_imports: list[ImportRecord] = field(default_factory=list)
+    last_seconds: float | None = None
+    last_imports: list[ImportRecord] = field(default_factory=list)
+
+
+_profiles: dict[str, RenderProfile] = {}
+_profiles_lock = threading.Lock()
+
+
+@contextmanager
+def profile_render(page: str) -> Iterator[None]:
+    """Time one run of a page and the imports it triggers (no-op unless APP_PROFILE=1)"""
+    if not ENABLED:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        with ImportRecorder() as recorder:
+            yield
+    finally:
+        # st.rerun() / st.stop() 也是以例外結束，一樣記錄
+        elapsed = time.perf_counter() - started_at
+        with _profiles_lock:
+            profile = _profiles.setdefault(page, RenderProfile(page))
+            if profile.runs == 0:
+                profile.first_seconds = elapsed
+                profile.first_imports = recorder.records
+            profile.runs += 1
+            profile.last_seconds = elapsed
+            profile.last_imports = recorder.records
+
+
+def render_profiles() -> list[RenderProfile]:
+    with _profiles_lock:
+        return list(_profiles.values())
+
+
+def import_times(module: str) -> list[tuple[str, float, float]]:
+    """(package, self seconds, cumulative seconds) of importing module in a fresh process"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    times = []
+    for line in completed.stderr.splitlines():
+        # import time:     self [us] |  cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, package = line.removeprefix("import time:").split("|")
+        times.append((package.rstrip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測模組的 import 耗時")
+    parser.add_argument(
+        "--module", action="append", help="要量測的模組，可重複指定（預設所有頁面用到的）"
+    )
+    parser.add_argument("--top", type=int, default=10, help="列出最慢的幾個套件")
+    args = parser.parse_args()
+
+    for module in args.module or APP_MODULES:
+        try:
+            times = import_times(module)
+        except RuntimeError as e:
+            print(f"{module}: 無法 import（{e}）")
+            continue
+
+        # 最後一行是要量測的模組本身，累計時間就是整個 import 的耗時
+        total = times[-1][2]
+        imported = {package.strip().split(".")[0] for package, _, _ in times}
+        heavy = [name for name in HEAVY_MODULES if name in imported]
+        print(
+            f"{module}: {total * 1000:.0f} ms"
+            + (f"，載入了 {'、'.join(heavy)}" if heavy else "")
+        )
+
+        if args.module:
+            slowest = sorted(times, key=lambda item: item[1], reverse=True)[: args.top]
+            for package, self_seconds, cumulative in slowest:
+                print(
+                    f"  {self_seconds * 1000:8.1f} ms  "
+                    f"(累計 {cumulative * 1000:8.1f} ms)  {package.strip()}"
+                )
+
+
+if __name__ == "__main__":
+    main()
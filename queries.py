@@ -0,0 +1,428 @@
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+import os
+import re
+from typing import Any
+
+from bson import ObjectId
+import streamlit as st
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from models import ArticleMongoModel, CommentMongoModel, ReplyMongoModel
+from pagination import Page, PageToken, fetch_page
+from query_cache import QueryRepository
+import monitoring
+import platform_stats
+import search_index
+
+# 每個畫面只向 MongoDB 要它會顯示的欄位；文章內文只有在選取文章後才讀取
+ARTICLE_LIST_FIELDS = ["_id", "title", "created_at", "article_id"]
+ARTICLE_HEADER_FIELDS = ["_id", "article_id", "title"]
+ARTICLE_DETAIL_FIELDS = ["_id", "article_id", "url", "title", "created_at", "content"]
+COMMENT_TABLE_FIELDS = [
+    "_id",
+    "reaction_type",
+    "content",
+    "author",
+    "likes",
+    "dislikes",
+    "created_at",
+]
+REPLY_TABLE_FIELDS = COMMENT_TABLE_FIELDS
+
+
+def projection(fields: Sequence[str]) -> dict[str, int]:
+    projected = {field: 1 for field in fields}
+    if "_id" not in projected:
+        projected["_id"] = 0
+    return projected
+
+
+# 以下的 db 可以是 pymongo 的 Database，也可以是頁面用的 query_cache.CachedDatabase，
+# 兩者用法相同，後者的讀取會經過查詢快取
+def articles_collection(db: Database) -> Collection[ArticleMongoModel]:
+    return db["articles"]
+
+
+def comments_collection(db: Database) -> Collection[CommentMongoModel]:
+    return db["comments"]
+
+
+def replies_collection(db: Database) -> Collection[ReplyMongoModel]:
+    return db["replies"]
+
+
+def count_articles(db: Database, query: dict[str, Any]) -> int:
+    if not query:
+        # 沒有條件時讀 collection 的 metadata，不用掃過整個 collection
+        return articles_collection(db).estimated_document_count()
+    return articles_collection(db).count_documents(query)
+
+
+def list_articles(
+    db: Database,
+    query: dict[str, Any],
+    limit: int,
+    after: PageToken | None = None,
+    before: PageToken | None = None,
+    fields: Sequence[str] = ARTICLE_LIST_FIELDS,
+) -> Page:
+    # 由新到舊排序
+    return fetch_page(
+        articles_collection(db),
+        query,
+        direction=-1,
+        limit=limit,
+        projection=projection(fields),
+        after=after,
+        before=before,
+    )
+
+
+def title_regex_query(text: str) -> dict[str, Any]:
+    """Substring match on the title without an index; the text is matched literally"""
+    return {"title": {"$regex": re.escape(text), "$options": "i"}}
+
+
+@dataclass
+class SearchStatus:
+    # 索引存在而且涵蓋所有文章，才用索引搜尋
+    ready: bool = False
+    # 索引存在但還沒索引最新的文章（search_index.py --watch 沒有在跑）
+    outdated: bool = False
+    include_content: bool = False
+    updated_at: datetime | None = None
+
+
+SEARCH_STATUS_TTL_SECONDS = 60
+
+
+@st.cache_data(
+    ttl=SEARCH_STATUS_TTL_SECONDS,
+    show_spinner=False,
+    hash_funcs={Database: lambda db: db.name},
+)
+def search_status(db: Database) -> SearchStatus:
+    """Whether the search index covers every article; the page never writes to it"""
+    state = search_index.index_state(db)
+    if state is None:
+        return SearchStatus()
+
+    if search_index.has_unindexed_articles(db, state):
+        # 補上新文章交給 search_index.py --watch，頁面只讀取
+        return SearchStatus(outdated=True, updated_at=state.get("updated_at"))
+
+    return SearchStatus(
+        ready=True,
+        include_content=bool(state.get("include_content")),
+        updated_at=state.get("updated_at"),
+    )
+
+
+def _articles_in_order(
+    db: Database, ids: list[ObjectId], fields: Sequence[str]
+) -> list[ArticleMongoModel]:
+    if not ids:
+        return []
+    articles = articles_collection(db).find(
+        {"_id": {"$in": ids}}, projection([*fields, "_id", "created_at"])
+    )
+    by_id = {article["_id"]: article for article in articles}
+    # 索引裡有、但文章已經被刪除的略過
+    return [by_id[_id] for _id in ids if _id in by_id]
+
+
+def count_search_results(db: Database, search: dict[str, Any]) -> int:
+    return db[search_index.SEARCH_COLLECTION].count_documents(search)
+
+
+def search_articles(
+    db: Database,
+    search: dict[str, Any],
+    limit: int,
+    after: PageToken | None = None,
+    before: PageToken | None = None,
+    fields: Sequence[str] = ARTICLE_LIST_FIELDS,
+) -> Page:
+    """Page through the articles matching a search_index query, newest first"""
+    search_page = fetch_page(
+        db[search_index.SEARCH_COLLECTION],
+        search,
+        direction=-1,
+        limit=limit,
+        projection={"created_at": 1},
+        after=after,
+        before=before,
+    )
+    ids = [document["_id"] for document in search_page.documents]
+    return Page(
+        documents=_articles_in_order(db, ids, fields),  # type: ignore[arg-type]
+        has_previous=search_page.has_previous,
+        has_next=search_page.has_next,
+    )
+
+
+def ranked_search(
+    db: Database,
+    text: str,
+    limit: int,
+    include_content: bool = False,
+    fields: Sequence[str] = ARTICLE_LIST_FIELDS,
+) -> list[ArticleMongoModel]:
+    """The best matching articles, most relevant first"""
+    pipeline = search_index.ranked_pipeline(text, limit, include_content)
+    if pipeline is None:
+        return []
+    ranked = db[search_index.SEARCH_COLLECTION].aggregate(pipeline)
+    return _articles_in_order(db, [document["_id"] for document in ranked], fields)
+
+
+def get_article(
+    db: Database, _id: ObjectId, fields: Sequence[str] = ARTICLE_DETAIL_FIELDS
+) -> ArticleMongoModel | None:
+    return articles_collection(db).find_one({"_id": _id}, projection(fields))
+
+
+def find_article_by_article_id(
+    db: Database, article_id: str, fields: Sequence[str] = ARTICLE_HEADER_FIELDS
+) -> ArticleMongoModel | None:
+    return articles_collection(db).find_one({"article_id": article_id}, projection(fields))
+
+
+def count_comments(db: Database, article_id: ObjectId, **filters: Any) -> int:
+    return comments_collection(db).count_documents({"article_id": article_id, **filters})
+
+
+@dataclass
+class ArticleCommentStats:
+    total: int = 0
+    positive: int = 0
+    negative: int = 0
+    neutral: int = 0
+    likes: int = 0
+    dislikes: int = 0
+    first_comment_at: datetime | None = None
+    last_comment_at: datetime | None = None
+    # 來自 platform_stats 統計文件時，統計的更新時間
+    materialized_at: datetime | None = None
+
+
+def article_comment_stats(db: Database, article_id: ObjectId) -> ArticleCommentStats:
+    """Count, reaction and like totals of an article's comments in one aggregation"""
+    # platform_stats.py 維護的統計文件只需讀一筆；還沒建立、或之後又有新留言時才即時彙整
+    materialized = platform_stats.get_article_stats(db, article_id)
+    if materialized is not None and not _has_comments_after(
+        db, article_id, materialized["watermark"]
+    ):
+        stats = _comment_stats_from_group(materialized)
+        stats.materialized_at = materialized.get("updated_at")
+        return stats
+
+    result = comments_collection(db).aggregate(
+        [
+            {"$match": {"article_id": article_id}},
+            {
+                "$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "positive": {
+                        "$sum": {"$cond": [{"$eq": ["$reaction_type", "+1"]}, 1, 0]}
+                    },
+                    "negative": {
+                        "$sum": {"$cond": [{"$eq": ["$reaction_type", "-1"]}, 1, 0]}
+                    },
+                    "likes": {"$sum": {"$ifNull": ["$likes", 0]}},
+                    "dislikes": {"$sum": {"$ifNull": ["$dislikes", 0]}},
+                    "first_comment_at": {"$min": "$created_at"},
+                    "last_comment_at": {"$max": "$created_at"},
+                }
+            },
+        ]
+    ).to_list()
+
+    if not result:
+        return ArticleCommentStats()
+    return _comment_stats_from_group(result[0])
+
+
+def _has_comments_after(
+    db: Database, article_id: ObjectId, watermark: ObjectId
+) -> bool:
+    # 統計文件記錄已經套用到哪個留言 _id，比它大的留言還沒算進去
+    comment = comments_collection(db).find_one(
+        {"article_id": article_id, "_id": {"$gt": watermark}}, {"_id": 1}
+    )
+    return comment is not None
+
+
+def _comment_stats_from_group(stats: dict[str, Any]) -> ArticleCommentStats:
+    return ArticleCommentStats(
+        total=stats["total"],
+        positive=stats["positive"],
+        negative=stats["negative"],
+        neutral=stats["total"] - stats["positive"] - stats["negative"],
+        likes=stats["likes"],
+        dislikes=stats["dislikes"],
+        first_comment_at=stats["first_comment_at"],
+        last_comment_at=stats["last_comment_at"],
+    )
+
+
+def list_comments(
+    db: Database,
+    article_id: ObjectId,
+    limit: int,
+    after: PageToken | None = None,
+    before: PageToken | None = None,
+    fields: Sequence[str] = COMMENT_TABLE_FIELDS,
+) -> Page:
+    # 由舊到新排序
+    return fetch_page(
+        comments_collection(db),
+        {"article_id": article_id},
+        direction=1,
+        limit=limit,
+        projection=projection(fields),
+        after=after,
+        before=before,
+    )
+
+
+def replies_by_comment(
+    db: Database,
+    article_id: ObjectId,
+    comment_ids: Sequence[ObjectId],
+    fields: Sequence[str] = REPLY_TABLE_FIELDS,
+) -> dict[ObjectId, list[ReplyMongoModel]]:
+    """Replies of every given comment in one query, oldest first, keyed by comment"""
+    grouped: dict[ObjectId, list[ReplyMongoModel]] = {
+        comment_id: [] for comment_id in comment_ids
+    }
+    if not comment_ids:
+        return grouped
+
+    replies = (
+        replies_collection(db)
+        .find(
+            {"article_id": article_id, "comment_id": {"$in": list(comment_ids)}},
+            projection([*fields, "comment_id"]),
+        )
+        .sort("created_at", 1)
+        .to_list()
+    )
+    for reply in replies:
+        grouped[reply["comment_id"]].append(reply)
+    return grouped
+
+
+@dataclass
+class PlatformOverview:
+    platform: str
+    articles: int
+    comments: int
+    replies: int
+    oldest_article_at: datetime | None
+    newest_article_at: datetime | None
+    estimated: bool
+    # 來自 platform_stats 統計文件時，統計的更新時間
+    materialized_at: datetime | None = None
+    # 統計文件裡每天（UTC）的文章、留言、回覆數，{"2025-01-01": {"articles": 3, ...}}
+    daily: dict[str, dict[str, int]] | None = None
+
+
+# 總覽頁的統計在查詢快取裡保留的秒數，可用環境變數 OVERVIEW_CACHE_TTL 調整
+OVERVIEW_CACHE_TTL_SECONDS = int(os.getenv("OVERVIEW_CACHE_TTL", "300"))
+
+
+def _count(collection: Collection, estimated: bool) -> int:
+    if estimated:
+        # 直接讀 collection 的 metadata，不掃描文件
+        return collection.estimated_document_count()
+    return collection.count_documents({})
+
+
+def _article_created_at(db: Database, direction: int) -> datetime | None:
+    article = articles_collection(db).find_one(
+        {}, {"created_at": 1, "_id": 0}, sort=[("created_at", direction)]
+    )
+    return article["created_at"] if article is not None else None
+
+
+def _materialized_overview(db: Database, platform: str) -> PlatformOverview | None:
+    summary = platform_stats.get_summary(db)
+    if summary is None or summary.get("updated_at") is None:
+        return None
+    return PlatformOverview(
+        platform=platform,
+        articles=summary["articles"],
+        comments=summary["comments"],
+        replies=summary["replies"],
+        oldest_article_at=summary.get("oldest_article_at"),
+        newest_article_at=summary.get("newest_article_at"),
+        estimated=False,
+        materialized_at=summary["updated_at"],
+        daily=summary.get("daily", {}),
+    )
+
+
+def platform_overviews(
+    repository: QueryRepository, platforms: Sequence[str], estimated: bool
+) -> list[PlatformOverview]:
+    """Read every platform's stats document, querying live (all at once) where it is missing"""
+    databases = {
+        platform: repository.database(platform, OVERVIEW_CACHE_TTL_SECONDS)
+        for platform in platforms
+    }
+    # 執行緒池裡送出的查詢也算在這一次重跑
+    with ThreadPoolExecutor(max_workers=len(platforms)) as executor:
+        materialized = dict(
+            zip(
+                platforms,
+                executor.map(
+                    monitoring.bind_rerun(
+                        lambda platform: _materialized_overview(
+                            databases[platform], platform
+                        )
+                    ),
+                    platforms,
+                ),
+            )
+        )
+
+    jobs: dict[tuple[str, str], Callable[[], Any]] = {}
+    for platform in platforms:
+        if materialized[platform] is not None:
+            continue
+        db = databases[platform]
+        jobs[(platform, "articles")] = partial(_count, articles_collection(db), estimated)
+        jobs[(platform, "comments")] = partial(_count, comments_collection(db), estimated)
+        jobs[(platform, "replies")] = partial(_count, replies_collection(db), estimated)
+        jobs[(platform, "oldest")] = partial(_article_created_at, db, 1)
+        jobs[(platform, "newest")] = partial(_article_created_at, db, -1)
+
+    results: dict[tuple[str, str], Any] = {}
+    if jobs:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = {
+                key: executor.submit(monitoring.bind_rerun(job))
+                for key, job in jobs.items()
+            }
+            results = {key: future.result() for key, future in futures.items()}
+
+    return [
+        materialized[platform]
+        or PlatformOverview(
+            platform=platform,
+            articles=results[(platform, "articles")],
+            comments=results[(platform, "comments")],
+            replies=results[(platform, "replies")],
+            oldest_article_at=results[(platform, "oldest")],
+            newest_article_at=results[(platform, "newest")],
+            estimated=estimated,
+        )
+        for platform in platforms
+    ]
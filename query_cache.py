@@ -0,0 +1,307 @@
+"""MongoDB 讀取結果的快取。
+
+Streamlit 每次互動都會重跑整個頁面；勾選一個選項或點選一列，同樣的 find、
+count_documents 又會再送一次。頁面改用 QueryRepository.database() 取得的 CachedDatabase，
+它和 pymongo 的 Database 用法相同，但讀取的結果會依
+(平台, collection, 操作, 條件, 投影, 排序, 分頁, TTL) 快取一段時間，超過容量時淘汰最久沒用到的。
+寫入等其他操作直接交給底下的 pymongo collection，不經過快取。
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+import os
+import pickle
+import threading
+import time
+from typing import Any
+
+from bson import json_util
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+DEFAULT_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL", "60"))
+DEFAULT_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+CacheKey = tuple[str, str, str, str, float]
+
+
+@dataclass
+class QueryCacheStats:
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    # 存 pickle 後的結果：容量算得準，呼叫端修改回傳值也不會動到快取
+    data: bytes
+    expires_at: float
+
+
+class QueryCache:
+    """Thread-safe LRU of query results with a TTL per entry and a cap on total bytes"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self,
+        key: CacheKey,
+        compute: Callable[[], Any],
+        ttl_seconds: float | None = None,
+    ) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return pickle.loads(entry.data)
+                self._remove(key)
+                self._expirations += 1
+            self._misses += 1
+
+        # 查詢本身不持有 lock，不同的查詢可以同時進行
+        value = compute()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return value
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(data, time.monotonic() + ttl)
+            self._size_bytes += len(data)
+            while self._size_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+
+        return value
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        self._size_bytes -= len(entry.data)
+
+    def invalidate(
+        self, platform: str | None = None, collection: str | None = None
+    ) -> int:
+        """Drop the cached results of a platform (and collection), or everything"""
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if (platform is None or key[0] == platform)
+                and (collection is None or key[1] == collection)
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> QueryCacheStats:
+        with self._lock:
+            return QueryCacheStats(
+                entries=len(self._entries),
+                size_bytes=self._size_bytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+            )
+
+
+class CachedResult(list):
+    """Cached aggregate / find results, also usable where a cursor's to_list() is called"""
+
+    def to_list(self, length: int | None = None) -> list:
+        return list(self) if length is None else self[:length]
+
+
+class CachedCursor:
+    """The chainable part of a pymongo cursor; the query runs on to_list() or iteration"""
+
+    def __init__(
+        self,
+        collection: "CachedCollection",
+        filter: dict[str, Any] | None,
+        projection: Any,
+        kwargs: dict[str, Any],
+    ):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._kwargs = kwargs
+        self._sort: Any = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list: Any, direction: int | None = None) -> "CachedCursor":
+        if isinstance(key_or_list, str):
+            key_or_list = [(key_or_list, direction or 1)]
+        self._sort = key_or_list
+        return self
+
+    def skip(self, skip: int) -> "CachedCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "CachedCursor":
+        self._limit = limit
+        return self
+
+    def _run(self) -> list[Any]:
+        cursor = self._collection.collection.find(
+            self._filter, self._projection, **self._kwargs
+        )
+        if self._sort is not None:
+            cursor = cursor.sort(self._sort)
+        return cursor.skip(self._skip).limit(self._limit).to_list()
+
+    def to_list(self, length: int | None = None) -> CachedResult:
+        documents = self._collection.cached(
+            "find",
+            (
+                self._filter,
+                self._projection,
+                self._kwargs,
+                self._sort,
+                self._skip,
+                self._limit,
+            ),
+            self._run,
+        )
+        return CachedResult(documents if length is None else documents[:length])
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.to_list())
+
+
+class CachedCollection:
+    """Read methods answered from the cache; everything else goes to the pymongo collection"""
+
+    def __init__(
+        self, collection: Collection, cache: QueryCache, ttl_seconds: float | None
+    ):
+        self.collection = collection
+        self._cache = cache
+        self._ttl_seconds = ttl_seconds
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    def cached(self, operation: str, arguments: Any, compute: Callable[[], Any]) -> Any:
+        ttl_seconds = (
+            self._cache.ttl_seconds if self._ttl_seconds is None else self._ttl_seconds
+        )
+        key = (
+            self.collection.database.name,
+            self.collection.name,
+            operation,
+            # ObjectId、datetime 都能轉成 JSON；同樣的查詢得到同樣的字串
+            json_util.dumps(arguments),
+            # 不同 TTL 的畫面各自快取，過期時間不會由先寫入的那一個決定
+            ttl_seconds,
+        )
+        return self._cache.get_or_compute(key, compute, ttl_seconds)
+
+    def find(
+        self, filter: dict[str, Any] | None = None, projection: Any = None, **kwargs: Any
+    ) -> CachedCursor:
+        return CachedCursor(self, filter, projection, kwargs)
+
+    def find_one(
+        self, filter: Any = None, projection: Any = None, **kwargs: Any
+    ) -> Any | None:
+        return self.cached(
+            "find_one",
+            (filter, projection, kwargs),
+            lambda: self.collection.find_one(filter, projection, **kwargs),
+        )
+
+    def count_documents(self, filter: dict[str, Any], **kwargs: Any) -> int:
+        return self.cached(
+            "count_documents",
+            (filter, kwargs),
+            lambda: self.collection.count_documents(filter, **kwargs),
+        )
+
+    def estimated_document_count(self, **kwargs: Any) -> int:
+        return self.cached(
+            "estimated_document_count",
+            kwargs,
+            lambda: self.collection.estimated_document_count(**kwargs),
+        )
+
+    def aggregate(self, pipeline: list[dict[str, Any]], **kwargs: Any) -> CachedResult:
+        return CachedResult(
+            self.cached(
+                "aggregate",
+                (pipeline, kwargs),
+                lambda: self.collection.aggregate(pipeline, **kwargs).to_list(),
+            )
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+
+class CachedDatabase:
+    def __init__(
+        self, database: Database, cache: QueryCache, ttl_seconds: float | None
+    ):
+        self.database = database
+        self._cache = cache
+        self._ttl_seconds = ttl_seconds
+
+    @property
+    def name(self) -> str:
+        return self.database.name
+
+    def __getitem__(self, name: str) -> CachedCollection:
+        return CachedCollection(self.database[name], self._cache, self._ttl_seconds)
+
+
+class QueryRepository:
+    """Hands out cached views of the platforms' databases sharing one QueryCache"""
+
+    def __init__(self, client: MongoClient, cache: QueryCache):
+        self.client = client
+        self.cache = cache
+
+    def database(
+        self, platform: str, ttl_seconds: float | None = None
+    ) -> CachedDatabase:
+        return CachedDatabase(self.client[platform], self.cache, ttl_seconds)
+
+    def invalidate(
+        self, platform: str | None = None, collection: str | None = None
+    ) -> int:
+        return self.cache.invalidate(platform, collection)
+
+    def stats(self) -> QueryCacheStats:
+        return self.cache.stats()
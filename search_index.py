@@ -0,0 +1,283 @@
+"""文章搜尋用的 n-gram 倒排索引，存在 MongoDB 的 article_search collection。
+
+    uv run python search_index.py                   # 所有平台，索引上次之後新增的文章
+    uv run python search_index.py --content         # 連內文一起索引（第一次建立或搭配 --full）
+    uv run python search_index.py --full --watch    # 重建後持續索引新文章
+
+標題正規化（NFKC、不分大小寫）後切成單字與相鄰兩字（bigram），存成有索引的陣列。
+搜尋時文章要包含查詢的所有 bigram，再用正規化後的標題確認查詢字串確實連續出現，
+結果和子字串搜尋相同，但 MongoDB 只需要走索引，不必掃描整個 collection。
+"""
+
+import argparse
+from collections.abc import Iterable, Sequence
+from itertools import islice
+import os
+import re
+import time
+import unicodedata
+from typing import Any
+
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+from pymongo.database import Database
+
+from mongo_config import create_client
+from platforms import platform_options
+from watermark import get_state, reset_watermark, set_watermark
+
+SEARCH_COLLECTION = "article_search"
+WATERMARK_NAME = "search:articles"
+
+# 改變切詞方式時加一，舊的索引需要用 --full 重建
+INDEX_VERSION = 2
+
+# 連續的字母、數字與中日韓文字；標點與空白只當作分隔
+RUN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _runs(text: str) -> list[str]:
+    return RUN_PATTERN.findall(normalize(text))
+
+
+def _bigrams(run: str) -> Iterable[str]:
+    return (run[i : i + 2] for i in range(len(run) - 1))
+
+
+def index_terms(text: str) -> list[str]:
+    """Distinct unigrams and bigrams of every run of letters, digits and CJK characters"""
+    terms: dict[str, None] = {}
+    for run in _runs(text):
+        terms.update(dict.fromkeys(run))
+        terms.update(dict.fromkeys(_bigrams(run)))
+    return list(terms)
+
+
+def query_terms(text: str) -> list[str]:
+    """Terms an indexed text must contain to include the query: bigrams, or the single character"""
+    terms: dict[str, None] = {}
+    for run in _runs(text):
+        terms.update(dict.fromkeys(_bigrams(run) if len(run) > 1 else [run]))
+    return list(terms)
+
+
+def query_words(text: str) -> list[str]:
+    """Whitespace separated parts of the normalized query, each must appear as is"""
+    return normalize(text).split()
+
+
+def ensure_indexes(db: Database, include_content: bool) -> None:
+    collection = db[SEARCH_COLLECTION]
+    # 先用 terms 找出候選，再依 (created_at, _id) 分頁
+    collection.create_index(
+        [("terms", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]
+    )
+    if include_content:
+        collection.create_index(
+            [
+                ("content_terms", ASCENDING),
+                ("created_at", DESCENDING),
+                ("_id", DESCENDING),
+            ]
+        )
+
+
+def index_state(db: Database) -> dict[str, Any] | None:
+    """Progress of the index, None when it was never built for this platform"""
+    state = get_state(db, WATERMARK_NAME)
+    if state is None or state.get("version") != INDEX_VERSION:
+        return None
+    return state
+
+
+def _search_document(article: dict[str, Any], include_content: bool) -> dict[str, Any]:
+    title = article.get("title") or ""
+    document = {
+        "created_at": article.get("created_at"),
+        "text": normalize(title),
+        "terms": index_terms(title),
+    }
+    if include_content:
+        # 內文很長，不另外保留正規化後的全文；單字也要索引，單一個字的查詢才找得到內文
+        document["content_terms"] = index_terms(article.get("content") or "")
+    return document
+
+
+def index_articles(
+    db: Database,
+    include_content: bool | None = None,
+    limit: int | None = None,
+    chunk_size: int = 1000,
+) -> int:
+    """Index the articles added since the last run; returns how many were indexed"""
+    state = index_state(db)
+    if include_content is None:
+        include_content = bool(state and state.get("include_content"))
+
+    query: dict[str, Any] = {}
+    if state is not None and state.get("watermark") is not None:
+        query["_id"] = {"$gt": state["watermark"]}
+    else:
+        ensure_indexes(db, include_content)
+
+    fields = {"title": 1, "created_at": 1}
+    if include_content:
+        fields["content"] = 1
+
+    articles = db["articles"].find(query, fields, sort=[("_id", 1)], batch_size=chunk_size)
+    if limit is not None:
+        articles = articles.limit(limit)
+
+    indexed = 0
+    while chunk := list(islice(articles, chunk_size)):
+        db[SEARCH_COLLECTION].bulk_write(
+            [
+                UpdateOne(
+                    {"_id": article["_id"]},
+                    {"$set": _search_document(article, include_content)},
+                    upsert=True,
+                )
+                for article in chunk
+            ],
+            ordered=False,
+        )
+        set_watermark(
+            db,
+            WATERMARK_NAME,
+            chunk[-1]["_id"],
+            version=INDEX_VERSION,
+            include_content=include_content,
+        )
+        indexed += len(chunk)
+
+    return indexed
+
+
+def has_unindexed_articles(db: Database, state: dict[str, Any]) -> bool:
+    query = {}
+    if state.get("watermark") is not None:
+        query["_id"] = {"$gt": state["watermark"]}
+    return db["articles"].find_one(query, {"_id": 1}) is not None
+
+
+def search_query(text: str, include_content: bool = False) -> dict[str, Any] | None:
+    """Query on article_search matching the text; None when it has nothing searchable"""
+    terms = query_terms(text)
+    if not terms:
+        return None
+
+    title_query: dict[str, Any] = {"terms": {"$all": terms}}
+    # bigram 全部出現不代表它們連在一起，用正規化後的標題確認
+    title_query["$and"] = [
+        {"text": {"$regex": re.escape(word)}} for word in query_words(text)
+    ]
+    if not include_content:
+        return title_query
+
+    return {"$or": [title_query, {"content_terms": {"$all": terms}}]}
+
+
+def ranked_pipeline(
+    text: str, limit: int, include_content: bool = False
+) -> list[dict[str, Any]] | None:
+    """Aggregation ranking articles by the share of query terms they contain"""
+    terms = query_terms(text)
+    if not terms:
+        return None
+
+    def overlap(field: str) -> dict[str, Any]:
+        return {
+            "$divide": [
+                {"$size": {"$setIntersection": [{"$ifNull": [f"${field}", []]}, terms]}},
+                len(terms),
+            ]
+        }
+
+    # 查詢字串完整出現在標題裡的排在前面
+    exact = {
+        "$cond": [
+            {
+                "$and": [
+                    {"$gte": [{"$indexOfCP": ["$text", word]}, 0]}
+                    for word in query_words(text)
+                ]
+            },
+            1,
+            0,
+        ]
+    }
+    score: dict[str, Any] = {"$add": [exact, overlap("terms")]}
+    match: dict[str, Any] = {"terms": {"$in": terms}}
+    if include_content:
+        score["$add"].append({"$multiply": [0.5, overlap("content_terms")]})
+        match = {"$or": [match, {"content_terms": {"$in": terms}}]}
+
+    return [
+        {"$match": match},
+        {"$project": {"created_at": 1, "score": score}},
+        {"$sort": {"score": -1, "created_at": -1, "_id": -1}},
+        {"$limit": limit},
+    ]
+
+
+def watch(client: MongoClient, platforms: Sequence[str], interval: float) -> None:
+    """Index new articles every few seconds"""
+    while True:
+        for platform in platforms:
+            indexed = index_articles(client[platform])
+            if indexed:
+                print(f"{platform}: 索引 {indexed} 篇新文章")
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="建立或更新文章搜尋索引")
+    parser.add_argument(
+        "--platform",
+        action="append",
+        choices=platform_options(),
+        help="要處理的平台，可重複指定（預設全部）",
+    )
+    parser.add_argument(
+        "--content", action="store_true", help="連內文一起索引（需搭配 --full 重建）"
+    )
+    parser.add_argument("--full", action="store_true", help="清掉既有索引後重建")
+    parser.add_argument("--watch", action="store_true", help="追上進度後持續索引新文章")
+    parser.add_argument("--interval", type=float, default=10.0, help="輪詢間隔秒數")
+    parser.add_argument(
+        "--chunk-size", type=int, default=1000, help="每次從 MongoDB 讀取並寫回的文章數"
+    )
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    client = create_client(args.mongo_uri)
+    platforms = args.platform or platform_options()
+
+    for platform in platforms:
+        db = client[platform]
+        state = index_state(db)
+        if args.full:
+            db[SEARCH_COLLECTION].drop()
+            reset_watermark(db, WATERMARK_NAME)
+            state = None
+
+        include_content = args.content
+        if state is not None:
+            if args.content and not state.get("include_content"):
+                parser.error(f"{platform} 的索引沒有包含內文，請加上 --full 重建")
+            include_content = bool(state.get("include_content"))
+
+        started_at = time.perf_counter()
+        indexed = index_articles(db, include_content, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - started_at
+        print(f"{platform}: 索引 {indexed} 篇，耗時 {elapsed:.1f} 秒")
+
+    if args.watch:
+        watch(client, platforms, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
+import os
+
 import streamlit as st
 
+from components import (
+    get_repository,
+    monitoring_panel,
+    profiling_panel,
+    query_cache_panel,
+)
+import monitoring
+import nlp
+import profiling
+
 st.set_page_config(
     page_title="Visualization of MongoDB data",
     layout="wide",
     initial_sidebar_state="expanded",
 )
 
+# 斷詞模型預設等到第一次用到關鍵字 / 文字雲才載入，其他頁面不用載入 HanLP；
+# 設定 NLP_WARM_UP=1 時在背景先載入，第一次用到時就不用等
+if os.getenv("NLP_WARM_UP") == "1":
+    nlp.warm_up()
+
 pg = st.navigation(
     pages=[
         st.Page("pages/database_overview.py", title="資料庫總覽", icon="📊"),
@@ -14,4 +31,13 @@ pg = st.navigation(
     ]
 )
 
-pg.run()
+# 頁面可能用 st.stop() 提早結束，之後（包括 finally 裡）的元件都不會顯示，
+# 所以側邊欄的面板在頁面之前畫；統計到上一次重跑為止
+query_cache_panel(get_repository())
+if monitoring.ENABLED:
+    monitoring_panel(pg.title)
+if profiling.ENABLED:
+    profiling_panel()
+
+with profiling.profile_render(pg.title), monitoring.track_rerun(pg.title):
+    pg.run()
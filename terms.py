@@ -0,0 +1,39 @@
+from collections import Counter
+from collections.abc import Iterable
+
+from bson import ObjectId
+from pymongo.database import Database
+
+import nlp
+
+# 離線斷詞（tokenize_corpus.py）寫入的詞頻 sidecar collection
+TERM_COLLECTIONS = {
+    "articles": "article_terms",
+    "comments": "comment_terms",
+    "replies": "reply_terms",
+}
+
+
+def encode_counts(counts: Counter[str]) -> list[list[str | int]]:
+    # 詞可能含有 "." 或以 "$" 開頭，不能直接當作 MongoDB 的欄位名稱
+    return [[word, count] for word, count in counts.most_common()]
+
+
+def decode_counts(encoded: list[list[str | int]]) -> Counter[str]:
+    return Counter({word: count for word, count in encoded})
+
+
+def load_term_counts(
+    db: Database, source: str, ids: Iterable[ObjectId]
+) -> dict[ObjectId, Counter[str]]:
+    """Return the precomputed term counts of the given documents that have them"""
+    ids = list(ids)
+    if not ids:
+        return {}
+
+    # 斷詞方式改變（SEGMENT_VERSION 加一）之後，重新執行 tokenize_corpus.py 之前的詞頻
+    # 都當作沒有，改成即時斷詞
+    documents = db[TERM_COLLECTIONS[source]].find(
+        {"_id": {"$in": ids}, "segment_version": nlp.SEGMENT_VERSION}, {"terms": 1}
+    )
+    return {document["_id"]: decode_counts(document["terms"]) for document in documents}
@@ -0,0 +1,152 @@
+"""BasicCleaner 與改寫前的版本（cleaner_reference.py）輸出必須完全相同。
+
+    uv run python -m unittest discover tests
+"""
+
+import random
+import unittest
+
+import emoji
+from emoji.unicode_codes import EMOJI_DATA
+
+import cleaner
+import cleaner_reference
+
+PTT_ARTICLE = (
+    "作者 user (暱稱)\n看板 Gossiping\n標題 [問卦] 有沒有八卦\n時間 Mon Apr 14 12:00:00 2025\n\n"
+    + "今天天氣很好，大家覺得呢？\n" * 20
+    + "\n\n--\n※ 發信站: 批踢踢實業坊(ptt.cc), 來自: 1.2.3.4 (臺灣)\n"
+    "※ 文章網址: https://www.ptt.cc/bbs/Gossiping/M.1700000000.A.123.html\n"
+    "※ 編輯: user (1.2.3.4 臺灣), 04/14/2025 12:30:00\n"
+)
+
+PTT_COMMENTS = [
+    "推 好文",
+    "噓 廢文....",
+    "→ 還好吧  我覺得 ---",
+    ": 1️⃣ 先看這個 https://i.imgur.com/abc.jpg",
+    "B1-2 樓上說的對 👍🏻👍🏻",
+]
+
+DCARD_ARTICLE = (
+    "大家好 😀 想問一下 👨‍👩‍👧 家庭旅遊推薦\n"
+    + "<p>第一天去了台南 🇹🇼</p>\n" * 5
+    + "\n---\n"
+    + "謝謝大家....\n" * 5
+    + "⸻⸻\n#️⃣ hashtag ©️ ™ ❤️‍🔥 🏳️‍🌈 🏴󠁧󠁢󠁳󠁣󠁴󠁿"
+)
+
+DCARD_COMMENTS = [
+    "B1 推推 ❤️",
+    "原PO好可愛 🥰🥰🥰",
+    "Instagram (dcard_official) 更多資訊歡迎追蹤",
+    "樓主 ☺︎ 👋🏽 ‍ ️",
+]
+
+YAHOO_ARTICLE = (
+    "記者王小明／台北報導\n"
+    + "政府今天宣布新的政策，引發各界討論。" * 30
+    + "\n▲川普上台後，其家族光靠加密幣就進帳高達323億。（圖／翻攝自川普臉書）\n"
+    "By-中央社\n"
+    "Instagram photos and videos\n"
+    "更多 Yahoo 奇摩報導\n看更多相關新聞\n相關報導\n延伸閱讀\n"
+)
+
+YAHOO_ARTICLES = [
+    YAHOO_ARTICLE,
+    "來源：中央社\n" + "股市今天收盤上漲。" * 10,
+    "文章撰文者｜王小明\n www.example.com " + "今日重點新聞。" * 10,
+    "文章出處：聯合報\n更多新聞\n",
+]
+
+SAMPLES = {
+    "ptt": [PTT_ARTICLE, *PTT_COMMENTS],
+    "dcard": [DCARD_ARTICLE, *DCARD_COMMENTS],
+    "yahoo": YAHOO_ARTICLES,
+}
+
+# 每個規則需要的字串與容易出錯的 emoji，隨機接起來測試規則之間的交互作用
+FRAGMENTS = [
+    "更多", "報導", "看更多相關新聞", "相關報導", "延伸閱讀", "看", "--\n",
+    "※ 發信站: 批踢踢實業坊(ptt.cc), 來自: 1.2.3.4\n",
+    "※ 文章網址: https://www.ptt.cc/bbs/x.html\n", "※ 編輯: abc\n",
+    "來源：", "文章撰文者｜", "文章出處：", "By-", "By—", "By:", "By",
+    "Instagram photos and videos", "Instagram (abc)", "Instagram", " (", ")",
+    "記者王小明／台北報導", "記者", "/", "／", "\n", "\r\n", " ", "  ",
+    "....", "...", ".", "<b>", "<", ">", "http://x.com/a", "www.y.tw", "https://",
+    "▲圖說。（圖／翻攝）", "。", "（", "）", "---", "⸻", "\t",
+    "😀", "👨‍👩‍👧", "1️⃣", "#️⃣", "️", "︎", "‍", "©", "™", "🇹🇼", "🇹", "👍🏻", "‍😀",
+    "中文字", "hello", "推", "：", "｜", "ｈｔｔｐ", "①", "B1-2",
+]
+
+
+class CleanerParityTest(unittest.TestCase):
+    def setUp(self):
+        self.cleaner = cleaner.BasicCleaner()
+        self.reference = cleaner_reference.BasicCleaner()
+
+    def assert_same(self, text: str):
+        self.assertEqual(
+            self.cleaner.clean_text(text), self.reference.clean_text(text), repr(text)
+        )
+
+    def test_platform_samples(self):
+        for platform, texts in SAMPLES.items():
+            for text in texts:
+                with self.subTest(platform=platform, text=text[:20]):
+                    self.assert_same(text)
+
+    def test_empty_text(self):
+        self.assert_same("")
+
+    def test_fragment_combinations(self):
+        rng = random.Random(20250414)
+        for _ in range(20000):
+            text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 25)))
+            if rng.random() < 0.3:
+                separator = rng.choice(["---", " --- ", "⸻⸻"])
+                text = text.replace("\n", f"\n{separator}\n")
+            self.assert_same(text)
+
+    def test_remove_floor_numbers(self):
+        for text in ["B1 推", "B12-3 同意", "沒有樓層", "AB1-"]:
+            self.assertEqual(
+                self.cleaner.remove_floor_numbers(text),
+                cleaner_reference.BasicCleaner().floor_pattern.sub("", text),
+            )
+
+
+class EmojiStripperTest(unittest.TestCase):
+    """remove_emojis must give the same result as emoji.replace_emoji"""
+
+    def setUp(self):
+        self.cleaner = cleaner.BasicCleaner()
+
+    def assert_same(self, text: str):
+        self.assertEqual(
+            self.cleaner.remove_emojis(text), emoji.replace_emoji(text, ""), repr(text)
+        )
+
+    def test_patterns_built(self):
+        self.assertIsNotNone(cleaner.EMOJI_PATTERNS)
+
+    def test_every_emoji(self):
+        for sequence in EMOJI_DATA:
+            for text in [sequence, f"a{sequence}b", sequence * 2, f"中{sequence}文"]:
+                self.assert_same(text)
+
+    def test_random_sequences(self):
+        sequences = list(EMOJI_DATA)
+        codepoints = sorted(set("".join(sequences)))
+        others = [*"ab1#*中文，。 \n", "‍", "︎", "️", "⃣"]
+        rng = random.Random(20250414)
+        for _ in range(50000):
+            text = "".join(
+                rng.choice(rng.choice([sequences, codepoints, others]))
+                for _ in range(rng.randint(1, 8))
+            )
+            self.assert_same(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""article_stats 重跑同一個 window（上限變大）時不能重複累加。
+
+需要一個可以隨意寫入的 MongoDB，沒有設定 MONGO_TEST_URI 時略過：
+
+    MONGO_TEST_URI=mongodb://localhost:27017 uv run python -m unittest discover tests
+"""
+
+from datetime import datetime, timedelta, timezone
+import os
+import unittest
+
+from mongo_config import create_client
+import platform_stats
+
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+
+ARTICLES = ["a", "b", "c"]
+
+
+def comment(index: int) -> dict:
+    return {
+        "_id": index,
+        "article_id": ARTICLES[index % len(ARTICLES)],
+        "reaction_type": ["+1", "-1", "→"][index % 3],
+        "likes": index % 4,
+        "created_at": datetime(2025, 4, 14, tzinfo=timezone.utc)
+        + timedelta(minutes=index),
+    }
+
+
+@unittest.skipUnless(MONGO_TEST_URI, "MONGO_TEST_URI 未設定")
+class ArticleStatsRerunTest(unittest.TestCase):
+    def setUp(self):
+        self.client = create_client(MONGO_TEST_URI)
+        self.db = self.client[f"test_platform_stats_{os.getpid()}"]
+        self.client.drop_database(self.db.name)
+        self.db["comments"].insert_many([comment(index) for index in range(1, 31)])
+
+    def tearDown(self):
+        self.client.drop_database(self.db.name)
+        self.client.close()
+
+    def article_stats(self) -> dict:
+        return {
+            stats["_id"]: {
+                field: stats.get(field)
+                for field in (
+                    *platform_stats._ARTICLE_COUNTS,
+                    "first_comment_at",
+                    "last_comment_at",
+                )
+            }
+            for stats in self.db[platform_stats.ARTICLE_STATS_COLLECTION].find()
+        }
+
+    def expected_stats(self, upper_id: int) -> dict:
+        self.db[platform_stats.ARTICLE_STATS_COLLECTION].delete_many({})
+        platform_stats._update_article_stats(self.db, None, upper_id)
+        expected = self.article_stats()
+        self.db[platform_stats.ARTICLE_STATS_COLLECTION].delete_many({})
+        return expected
+
+    def test_rerun_with_larger_upper_bound(self):
+        expected = self.expected_stats(20)
+
+        # 第一次跑完 article_stats 後、更新 summary 前中斷，重跑時 window 變大
+        platform_stats._update_article_stats(self.db, None, 10)
+        platform_stats._update_article_stats(self.db, None, 20)
+        self.assertEqual(self.article_stats(), expected)
+
+        platform_stats._update_article_stats(self.db, None, 20)
+        self.assertEqual(self.article_stats(), expected)
+
+    def test_overlapping_runs(self):
+        expected = self.expected_stats(30)
+
+        # 手動執行與 --watch 同時從同一個起點開始，各自的上限不同
+        platform_stats._update_article_stats(self.db, None, 5)
+        platform_stats._update_article_stats(self.db, 5, 25)
+        platform_stats._update_article_stats(self.db, 5, 15)
+        platform_stats._update_article_stats(self.db, 25, 30)
+        self.assertEqual(self.article_stats(), expected)
+
+    def test_update_platform_after_interrupted_window(self):
+        expected = self.expected_stats(30)
+
+        platform_stats._update_article_stats(self.db, None, 10)
+        platform_stats.update_platform(self.db)
+
+        summary = platform_stats.get_summary(self.db)
+        assert summary is not None
+        self.assertEqual(summary["comments"], 30)
+        self.assertEqual(self.article_stats(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
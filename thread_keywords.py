@@ -0,0 +1,153 @@
+"""整個討論串（所有留言與回覆）的詞頻。
+
+一次只從 cursor 讀一批文件、斷詞後併入累計的 Counter，記憶體只和詞彙量有關，
+不會因為討論串有幾萬則推文就一次全部載入。每處理完一批就回報進度與目前的結果，
+算完的詞頻依文章快取在記憶體裡。
+"""
+
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from itertools import islice
+import threading
+from typing import Any
+
+from bson import ObjectId
+from pymongo.database import Database
+
+import dedupe
+import monitoring
+import nlp
+from terms import load_term_counts
+
+THREAD_SOURCES = ["comments", "replies"]
+
+# 每次從 MongoDB 讀取並斷詞的文件數
+DEFAULT_BATCH_SIZE = 500
+
+# 累計的詞超過這個數量的兩倍時，只保留最常出現的這些詞
+DEFAULT_MAX_TERMS = 50_000
+
+# 記憶體裡保留幾篇文章的結果
+CACHED_THREADS = 32
+
+
+class BoundedCounter:
+    """Counter that drops its rarest terms once it holds twice max_terms of them
+
+    只出現一兩次的詞被丟掉之後，再出現時會從頭計算；出現次數多的詞（關鍵字）不受影響。
+    """
+
+    def __init__(self, max_terms: int = DEFAULT_MAX_TERMS):
+        self.max_terms = max_terms
+        self.counts: Counter[str] = Counter()
+        self.pruned = 0
+
+    def update(self, counts: Counter[str]) -> None:
+        self.counts.update(counts)
+        if len(self.counts) > 2 * self.max_terms:
+            self.pruned += len(self.counts) - self.max_terms
+            self.counts = Counter(dict(self.counts.most_common(self.max_terms)))
+
+
+@dataclass
+class ThreadProgress:
+    processed: int
+    total: int
+    counts: Counter[str]
+
+
+_finished: OrderedDict[tuple[str, ObjectId, int], Counter[str]] = OrderedDict()
+_finished_lock = threading.Lock()
+
+
+def count_thread_documents(db: Any, article_id: ObjectId) -> int:
+    return sum(
+        db[source].count_documents({"article_id": article_id})
+        for source in THREAD_SOURCES
+    )
+
+
+def cached_counts(
+    platform: str, article_id: ObjectId, total: int
+) -> Counter[str] | None:
+    """Finished counts of the thread, None when it changed size or was never mined"""
+    with _finished_lock:
+        counts = _finished.get((platform, article_id, total))
+        if counts is not None:
+            _finished.move_to_end((platform, article_id, total))
+        return counts
+
+
+def _store(
+    platform: str, article_id: ObjectId, total: int, counts: Counter[str]
+) -> None:
+    with _finished_lock:
+        _finished[(platform, article_id, total)] = counts
+        while len(_finished) > CACHED_THREADS:
+            _finished.popitem(last=False)
+
+
+def _batch_counts(
+    db: Database,
+    source: str,
+    documents: list[dict[str, Any]],
+    get_nlp: Callable[[], nlp.Nlp | None],
+) -> Counter[str] | None:
+    ids = [document["_id"] for document in documents]
+    # 離線算好的詞頻直接用，其餘的才斷詞
+    precomputed = load_term_counts(db, source, ids)
+
+    counts: Counter[str] = Counter()
+    for document_counts in precomputed.values():
+        counts.update(document_counts)
+
+    texts = [
+        document.get("content") or ""
+        for document in documents
+        if document["_id"] not in precomputed
+    ]
+    if texts:
+        nlp_instance = get_nlp()
+        if nlp_instance is None:
+            return None
+        with monitoring.stage("斷詞"):
+            if source == "replies":
+                texts = [
+                    nlp_instance.cleaner.remove_floor_numbers(text) for text in texts
+                ]
+            counts.update(dedupe.weighted_word_counts(nlp_instance, texts))
+
+    return counts
+
+
+def mine_thread(
+    db: Database,
+    article_id: ObjectId,
+    total: int,
+    get_nlp: Callable[[], nlp.Nlp | None] = nlp.get_shared_nlp,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_terms: int = DEFAULT_MAX_TERMS,
+) -> Iterator[ThreadProgress]:
+    """Count the words of every comment and reply, yielding the running counts per batch
+
+    db 要是 pymongo 的 Database：文件是一批一批讀的，不經過查詢快取。
+    get_nlp 只有在有文件沒有離線詞頻時才會呼叫；它回傳 None（斷詞模型還沒載入完成）時
+    就停止，這次的結果不會存起來。
+    """
+    counter = BoundedCounter(max_terms)
+    processed = 0
+
+    for source in THREAD_SOURCES:
+        documents = db[source].find(
+            {"article_id": article_id}, {"content": 1}, batch_size=batch_size
+        )
+        while batch := list(islice(documents, batch_size)):
+            batch_counts = _batch_counts(db, source, batch, get_nlp)
+            if batch_counts is None:
+                return
+            counter.update(batch_counts)
+            processed += len(batch)
+            yield ThreadProgress(processed, max(total, processed), counter.counts)
+
+    _store(db.name, article_id, total, counter.counts)
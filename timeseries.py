@@ -0,0 +1,156 @@
+"""文章與留言數量隨時間的變化，在 MongoDB 裡用 $dateTrunc + $group 彙整。
+
+依時間範圍自動挑選區間大小（1 分鐘到 1 個月），每張圖最多 MAX_POINTS 個點，
+不管範圍多長，傳回來的資料量都差不多。$dateTrunc 需要 MongoDB 5.0 以上。
+頁面傳入 query_cache.CachedDatabase 時，結果依 (平台, 文章, 區間) 快取。
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Literal
+
+from bson import ObjectId
+import pandas as pd
+
+MAX_POINTS = 2000
+
+TimeUnit = Literal["minute", "hour", "day", "week", "month"]
+
+
+@dataclass(frozen=True)
+class Bucket:
+    unit: TimeUnit
+    size: int
+    # 用來估計點數；月份的長度取 31 天
+    duration: timedelta
+    label: str
+
+
+BUCKETS = [
+    Bucket("minute", 1, timedelta(minutes=1), "每分鐘"),
+    Bucket("minute", 5, timedelta(minutes=5), "每 5 分鐘"),
+    Bucket("minute", 15, timedelta(minutes=15), "每 15 分鐘"),
+    Bucket("hour", 1, timedelta(hours=1), "每小時"),
+    Bucket("hour", 6, timedelta(hours=6), "每 6 小時"),
+    Bucket("day", 1, timedelta(days=1), "每天"),
+    Bucket("week", 1, timedelta(weeks=1), "每週"),
+    Bucket("month", 1, timedelta(days=31), "每月"),
+]
+
+
+def choose_bucket(
+    start: datetime,
+    end: datetime,
+    max_points: int = MAX_POINTS,
+    smallest: TimeUnit = "minute",
+) -> Bucket:
+    """The finest bucket (no finer than smallest) that keeps the range under max_points"""
+    span = max(end - start, timedelta(0))
+    candidates = BUCKETS[[bucket.unit for bucket in BUCKETS].index(smallest) :]
+    for bucket in candidates:
+        if span / bucket.duration <= max_points:
+            return bucket
+    return candidates[-1]
+
+
+def _volume_pipeline(
+    match: dict[str, Any], bucket: Bucket, reactions: bool
+) -> list[dict[str, Any]]:
+    group: dict[str, Any] = {
+        "_id": {
+            "$dateTrunc": {
+                "date": "$created_at",
+                "unit": bucket.unit,
+                "binSize": bucket.size,
+            }
+        },
+        "count": {"$sum": 1},
+    }
+    if reactions:
+        group["positive"] = {
+            "$sum": {"$cond": [{"$eq": ["$reaction_type", "+1"]}, 1, 0]}
+        }
+        group["negative"] = {
+            "$sum": {"$cond": [{"$eq": ["$reaction_type", "-1"]}, 1, 0]}
+        }
+
+    # 沒有時間的文件不畫
+    match = {"created_at": {"$ne": None}, **match}
+    return [
+        {"$match": match},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def _frame(rows: list[dict[str, Any]], columns: list[str]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "time": pd.to_datetime([row["_id"] for row in rows]),
+            **{column: [row.get(column, 0) for row in rows] for column in columns},
+        }
+    )
+
+
+def article_volume(
+    db: Any, start: datetime, end: datetime
+) -> tuple[pd.DataFrame, Bucket]:
+    """Articles per bucket (a day or coarser) between start and end"""
+    bucket = choose_bucket(start, end, smallest="day")
+    rows = db["articles"].aggregate(
+        _volume_pipeline({"created_at": {"$gte": start, "$lte": end}}, bucket, False)
+    ).to_list()
+    frame = _frame(rows, ["count"]).rename(columns={"count": "articles"})
+    return frame, bucket
+
+
+def daily_volume(
+    daily: Mapping[str, Mapping[str, int]],
+    source: str,
+    start: datetime,
+    end: datetime,
+) -> tuple[pd.DataFrame, Bucket]:
+    """Documents of source per bucket from platform_stats' daily counts, without a query"""
+    bucket = choose_bucket(start, end, smallest="day")
+    days = sorted(daily)
+    frame = pd.DataFrame(
+        {
+            "time": pd.to_datetime(days),
+            source: [daily[day].get(source, 0) for day in days],
+        }
+    )
+    # 與 $dateTrunc 相同：週從星期日開始，月從 1 號開始
+    if bucket.unit == "week":
+        frame["time"] = frame["time"].dt.to_period("W-SAT").dt.start_time
+    elif bucket.unit == "month":
+        frame["time"] = frame["time"].dt.to_period("M").dt.start_time
+    frame = frame[frame[source] > 0].groupby("time", as_index=False)[source].sum()
+    return frame, bucket
+
+
+def thread_volume(
+    db: Any, article_id: ObjectId, start: datetime, end: datetime
+) -> tuple[pd.DataFrame, Bucket]:
+    """Comments, replies and push / boo ratios of an article's thread per bucket"""
+    bucket = choose_bucket(start, end)
+    match = {"article_id": article_id}
+
+    comments = _frame(
+        db["comments"].aggregate(_volume_pipeline(match, bucket, True)).to_list(),
+        ["count", "positive", "negative"],
+    ).rename(columns={"count": "comments"})
+    replies = _frame(
+        db["replies"].aggregate(_volume_pipeline(match, bucket, False)).to_list(),
+        ["count"],
+    ).rename(columns={"count": "replies"})
+
+    frame = comments.merge(replies, on="time", how="outer").fillna(0)
+    frame = frame.sort_values("time")
+    for column in ["comments", "positive", "negative", "replies"]:
+        frame[column] = frame[column].astype("int64")
+
+    commented = frame["comments"].where(frame["comments"] > 0)
+    frame["push_ratio"] = (frame["positive"] / commented).fillna(0.0)
+    frame["boo_ratio"] = (frame["negative"] / commented).fillna(0.0)
+    return frame.reset_index(drop=True), bucket
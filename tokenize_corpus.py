@@ -0,0 +1,167 @@
+"""離線斷詞：把每篇文章、留言、回覆的詞頻預先算好，寫回 MongoDB 的 sidecar collection。
+
+    uv run python tokenize_corpus.py                  # 所有平台，從上次的進度繼續
+    uv run python tokenize_corpus.py --platform ptt --workers 4
+    uv run python tokenize_corpus.py --full           # 忽略進度，全部重算
+
+進度以各 collection 已處理到的最大 _id 記錄在 pipeline_state，重跑時只處理新文件；
+nlp.SEGMENT_VERSION 改變時自動從頭重算。
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+import multiprocessing
+import os
+import time
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from mongo_config import create_client
+import nlp
+from platforms import platform_options
+from terms import TERM_COLLECTIONS, encode_counts
+from watermark import get_state, reset_watermark, set_watermark
+
+_worker_nlp: nlp.Nlp | None = None
+
+
+def _init_worker():
+    global _worker_nlp
+    # 每個 worker process 各自載入一份模型；離線工作不需要斷詞快取
+    _worker_nlp = nlp.Nlp(cache=None)
+
+
+def _count_batch(job: tuple[str, list[str]]) -> list[list[list[str | int]]]:
+    source, texts = job
+    assert _worker_nlp is not None
+
+    if source == "replies":
+        texts = [_worker_nlp.cleaner.remove_floor_numbers(text) for text in texts]
+
+    word_counts = _worker_nlp.word_count_many(texts)
+    return [encode_counts(counts) for counts in word_counts.documents]
+
+
+def watermark_name(source: str) -> str:
+    return f"terms:{source}"
+
+
+def tokenize_collection(
+    db: Database,
+    source: str,
+    executor: ProcessPoolExecutor,
+    batch_size: int,
+    chunk_size: int,
+) -> int:
+    collection = db[source]
+    terms_collection = db[TERM_COLLECTIONS[source]]
+
+    query = {}
+    state = get_state(db, watermark_name(source))
+    # SEGMENT_VERSION 改變後從頭重算；在那之前頁面不會使用舊版本的詞頻
+    # （第一版的進度沒有記錄版本）
+    if (
+        state is not None
+        and state.get("watermark") is not None
+        and state.get("segment_version", 1) == nlp.SEGMENT_VERSION
+    ):
+        query["_id"] = {"$gt": state["watermark"]}
+
+    documents = collection.find(
+        query, {"content": 1, "article_id": 1}, sort=[("_id", 1)], batch_size=chunk_size
+    )
+
+    processed = 0
+    while chunk := list(islice(documents, chunk_size)):
+        texts = [document.get("content") or "" for document in chunk]
+        jobs = [
+            (source, texts[start : start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ]
+        encoded = [counts for batch in executor.map(_count_batch, jobs) for counts in batch]
+
+        now = datetime.now(timezone.utc)
+        terms_collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": document["_id"]},
+                    {
+                        "$set": {
+                            "article_id": document.get("article_id", document["_id"]),
+                            "terms": terms,
+                            "segment_version": nlp.SEGMENT_VERSION,
+                            "updated_at": now,
+                        }
+                    },
+                    upsert=True,
+                )
+                for document, terms in zip(chunk, encoded)
+            ],
+            ordered=False,
+        )
+
+        # 這一批都寫入後才推進進度，中斷後重跑不會漏掉文件
+        set_watermark(
+            db,
+            watermark_name(source),
+            chunk[-1]["_id"],
+            segment_version=nlp.SEGMENT_VERSION,
+        )
+        processed += len(chunk)
+
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="預先計算文章、留言與回覆的詞頻")
+    parser.add_argument(
+        "--platform",
+        action="append",
+        choices=platform_options(),
+        help="要處理的平台，可重複指定（預設全部）",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        choices=list(TERM_COLLECTIONS),
+        help="要處理的 collection，可重複指定（預設全部）",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="斷詞 process 數")
+    parser.add_argument(
+        "--batch-size", type=int, default=nlp.DEFAULT_BATCH_SIZE, help="每次送進模型的文件數"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=1000, help="每次從 MongoDB 讀取並寫回的文件數"
+    )
+    parser.add_argument("--full", action="store_true", help="忽略進度，從頭重算")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    args = parser.parse_args()
+
+    client = create_client(args.mongo_uri)
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        # torch 在 fork 之後的行為不可靠
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        for platform in args.platform or platform_options():
+            db = client[platform]
+
+            for source in args.source or list(TERM_COLLECTIONS):
+                if args.full:
+                    reset_watermark(db, watermark_name(source))
+
+                started_at = time.perf_counter()
+                processed = tokenize_collection(
+                    db, source, executor, args.batch_size, args.chunk_size
+                )
+                elapsed = time.perf_counter() - started_at
+                print(f"{platform}.{source}: {processed} 筆，耗時 {elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
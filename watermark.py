@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from typing import Any
+
+from pymongo.database import Database
+
+# 離線工作的進度（high-water mark）都記在這個 collection，一個工作一筆
+STATE_COLLECTION = "pipeline_state"
+
+
+def get_state(db: Database, name: str) -> dict[str, Any] | None:
+    """The whole progress document, including the extra fields passed to set_watermark"""
+    return db[STATE_COLLECTION].find_one({"_id": name})
+
+
+def get_watermark(db: Database, name: str) -> Any | None:
+    state = get_state(db, name)
+    if state is None:
+        return None
+    return state.get("watermark")
+
+
+def set_watermark(db: Database, name: str, watermark: Any, **extra: Any) -> None:
+    db[STATE_COLLECTION].update_one(
+        {"_id": name},
+        {
+            "$set": {
+                "watermark": watermark,
+                "updated_at": datetime.now(timezone.utc),
+                **extra,
+            }
+        },
+        upsert=True,
+    )
+
+
+def reset_watermark(db: Database, name: str) -> None:
+    db[STATE_COLLECTION].delete_one({"_id": name})